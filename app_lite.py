@@ -1,23 +1,46 @@
 #!/usr/bin/env python3
 from flask import Flask, jsonify, request, render_template, send_from_directory
 from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import heapq
+import math
+import queue
+import random
+import socket
 import threading
 import time
 import uuid
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from datetime import datetime, timedelta
 import os
 from pathlib import Path
 import mysql.connector
 from mysql.connector import pooling
-from dataclasses import asdict
+from functools import lru_cache
+
+# orjson (optional) für den Flask-JSON-Provider; json_dumps/json_loads kommen aus effect_builder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optionale Audio-Library nur einmal beim Start laden
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
 
 # Smart Error Handling System
 from error_handler import smart_error_handler, log_system_error, get_system_health, get_error_stats
+from error_handler import HEALTH_EXECUTOR, HEALTH_PROBE_TIMEOUT, run_probes, reload_env
 
 # Effect Builder System
-from effect_builder import EffectBuilder, init_effect_builder_db
+from effect_builder import EffectBuilder, init_effect_builder_db, step_to_dict, json_dumps, json_loads, write_text_atomic
 
 # .env Datei laden falls vorhanden
 def load_env():
@@ -31,13 +54,51 @@ def load_env():
                     os.environ[key] = value
 
 load_env()
+# error_handler wurde vor load_env importiert: Health-Probe-Konfiguration mit .env neu lesen
+reload_env()
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON-Provider auf Basis von orjson, Ausgabe wie DefaultJSONProvider"""
+    
+    def dumps(self, obj, **kwargs):
+        # Datumswerte über self.default -> gleiches HTTP-Datumsformat wie Flask
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def json_default(obj):
+    """Zusätzliche Typen für JSON-Antworten, z.B. schreibgeschützte Templates (MappingProxyType)"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    return DefaultJSONProvider.default(obj)
 
 app = Flask(__name__, template_folder='public')
+if orjson:
+    app.json = OrjsonProvider(app)
+app.json.default = json_default
 CORS(app)
 
 # Konfiguration mit Umgebungsvariablen
 HUE_BRIDGE_IP = os.getenv('HUE_BRIDGE_IP', '192.168.2.35')
 HUE_USERNAME = os.getenv('HUE_USERNAME', '1trezWogQDPyNuC19bcyOHp8BsNCMZr6wKfXwe6w')
+HUE_API_BASE = f"http://{HUE_BRIDGE_IP}/api/{HUE_USERNAME}"
+
+# Gemeinsame HTTP-Session für alle Bridge-Aufrufe (Keep-Alive statt Handshake pro Request)
+HUE_SESSION = requests.Session()
+HUE_SESSION.headers.update({'Connection': 'keep-alive'})
+_hue_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, read=0, backoff_factor=0.1)
+)
+HUE_SESSION.mount('http://', _hue_adapter)
+HUE_SESSION.mount('https://', _hue_adapter)
 
 # MySQL Konfiguration
 MYSQL_CONFIG = {
@@ -50,12 +111,72 @@ MYSQL_CONFIG = {
     'pool_reset_session': True
 }
 
+# Typ-Konvertierung für gespeicherte Preferences/Settings (data_type -> Parser)
+VALUE_PARSERS = {
+    'int': int,
+    'float': float,
+    'bool': lambda value: value.lower() == 'true',
+    'json': json_loads
+}
+
+def parse_typed_value(value, data_type):
+    """DB-String anhand von data_type konvertieren, unbekannte Typen bleiben String"""
+    parser = VALUE_PARSERS.get(data_type)
+    return parser(value) if parser else value
+
+# Python-Typ -> (data_type, Serializer) für das Speichern
+VALUE_SERIALIZERS = {
+    bool: ('bool', lambda value: 'true' if value else 'false'),
+    int: ('int', str),
+    float: ('float', str),
+    dict: ('json', json_dumps),
+    list: ('json', json_dumps)
+}
+
+def serialize_typed_value(value):
+    """Wert in (DB-String, data_type) umwandeln, unbekannte Typen als 'string'"""
+    data_type, serializer = VALUE_SERIALIZERS.get(type(value), ('string', str))
+    return serializer(value), data_type
+
+# Ändert sich nur durch save_onboarding_config, daher einmal beim Start prüfen
+ONBOARDING_COMPLETED = os.path.exists('.onboarding_completed')
+
+# Stromverbrauch: max 9W pro LED bei voller Helligkeit (254)
+WATTS_PER_BRIGHTNESS = 9 / 254
+
+def estimate_power(lights):
+    """Geschätzten Verbrauch aller eingeschalteten Lichter berechnen.
+
+    Gibt ([(light_id, light, state, brightness, watts), ...], total_watts) zurück.
+    Unreachable Lichter zählen mit, da sie auch Strom verbrauchen wenn sie "on" sind.
+    """
+    factor = WATTS_PER_BRIGHTNESS
+    active = []
+    append = active.append
+    total = 0.0
+    for light_id, light in lights.items():
+        state = light.get('state', {})
+        if state.get('on', False):
+            brightness = state.get('bri', 254)
+            watts = brightness * factor
+            total += watts
+            append((light_id, light, state, brightness, watts))
+    return active, total
+
 # Globale Variablen für Effects und Timer
 running_effects = {}
 active_timers = {}
 db_pool = None
 power_logging_thread = None
-effect_builder = None
+# Dateibasiert bis init_db() beim Start den Pool bereitstellt
+effect_builder = EffectBuilder(db_pool)
+
+def stop_running_effect(effect_id):
+    """Effekt aus running_effects entfernen und wartende Worker sofort wecken"""
+    entry = running_effects.pop(effect_id, None)
+    if isinstance(entry, dict) and 'stop_event' in entry:
+        entry['stop_event'].set()
+    return entry is not None
 
 # Smart Caching System für Performance
 cache_store = {}
@@ -73,9 +194,12 @@ def set_cache(key, value, ttl_seconds=30):
     cache_store[key] = value
     cache_ttl[key] = time.time()
 
-def invalidate_cache(pattern=None):
-    """Cache invalidieren"""
-    if pattern:
+def invalidate_cache(pattern=None, exact=False):
+    """Cache invalidieren (pattern als Teilstring, mit exact=True nur genau dieser Key)"""
+    if pattern and exact:
+        cache_store.pop(pattern, None)
+        cache_ttl.pop(pattern, None)
+    elif pattern:
         keys_to_remove = [k for k in cache_store.keys() if pattern in k]
         for key in keys_to_remove:
             cache_store.pop(key, None)
@@ -84,6 +208,22 @@ def invalidate_cache(pattern=None):
         cache_store.clear()
         cache_ttl.clear()
 
+def encode_json(payload):
+    """Payload einmal kodieren, damit Cache-Treffer nicht erneut serialisieren"""
+    return app.json.dumps(payload, separators=(',', ':'))
+
+def cached_json_response(body, max_age):
+    """Bereits kodierte JSON-Antwort mit Cache-Control Header für Polling-Endpunkte"""
+    response = app.response_class(body, mimetype='application/json')
+    response.headers['Cache-Control'] = f'max-age={max_age}'
+    return response
+
+# TTLs für häufig gepollte Status-Endpunkte (Sekunden)
+STATUS_CACHE_TTL = 2
+ANALYTICS_CACHE_TTL = 60
+SETTINGS_CACHE_TTL = 300  # invalidate_cache('system_settings') nach Änderungen
+PREFERENCES_CACHE_TTL = 300  # set_user_preferences invalidiert den User-Eintrag
+
 # Debug-Logging System
 debug_logs = []
 debug_stats = {
@@ -103,13 +243,40 @@ def get_lights_raw():
         return cached
     
     try:
-        response = requests.get(f"http://{HUE_BRIDGE_IP}/api/{HUE_USERNAME}/lights", timeout=2)
-        result = response.json()
+        response = HUE_SESSION.get(f"{HUE_API_BASE}/lights", timeout=2)
+        result = json_loads(response.content)
         set_cache(cache_key, result, 15)
         return result
     except:
         return {}
 
+# Custom-Effekte: Standard-Obergrenze für die Laufzeit in Sekunden
+CUSTOM_EFFECT_MAX_RUNTIME = 3600
+
+# Custom-Effekte: Liste aller Licht-IDs höchstens so oft neu laden
+ALL_LIGHTS_REFRESH_SECONDS = 30
+
+# Zustandsänderungen pro Licht innerhalb dieses Fensters zu einem PUT zusammenfassen
+LIGHT_COALESCE_WINDOW = 0.1
+
+# Paralleles Senden von Licht-Zuständen (Bridge verkraftet ca. 10 Requests gleichzeitig)
+LIGHT_FANOUT_WORKERS = 10
+light_fanout_executor = ThreadPoolExecutor(max_workers=LIGHT_FANOUT_WORKERS,
+                                           thread_name_prefix='hue-fanout')
+
+@lru_cache(maxsize=256)
+def light_state_endpoint(light_id):
+    """State-Endpunkt pro Licht nur einmal zusammenbauen"""
+    return f'lights/{light_id}/state'
+
+def put_light_states(commands):
+    """Mehrere (light_id, command)-Paare parallel senden und auf alle warten"""
+    futures = [
+        light_fanout_executor.submit(hue_request, light_state_endpoint(light_id), 'PUT', command)
+        for light_id, command in commands
+    ]
+    wait(futures)
+
 def add_debug_log(log_type, message, endpoint=None, data=None):
     """Debug-Log-Eintrag hinzufügen"""
     global debug_logs, debug_stats
@@ -140,7 +307,7 @@ def hue_request(endpoint, method='GET', data=None):
     global debug_stats
     
     try:
-        url = f"http://{HUE_BRIDGE_IP}/api/{HUE_USERNAME}/{endpoint}"
+        url = f"{HUE_API_BASE}/{endpoint}"
         debug_stats['total_requests'] += 1
         
         # Debug-Log für ausgehende Anfrage
@@ -151,13 +318,13 @@ def hue_request(endpoint, method='GET', data=None):
         timeout = 1.5 if endpoint.startswith(('lights/', 'groups/')) else 3
         
         if method == 'GET':
-            response = requests.get(url, timeout=timeout)
+            response = HUE_SESSION.get(url, timeout=timeout)
         elif method == 'PUT':
-            response = requests.put(url, json=data, timeout=timeout)
+            response = HUE_SESSION.put(url, json=data, timeout=timeout)
         elif method == 'POST':
-            response = requests.post(url, json=data, timeout=timeout)
+            response = HUE_SESSION.post(url, json=data, timeout=timeout)
         
-        result = response.json()
+        result = json_loads(response.content)
         
         # Erfolgreiche Antwort loggen
         if response.status_code == 200:
@@ -211,8 +378,7 @@ def emergency_strobe_stop():
     # Alle Strobo-Effekte stoppen
     strobo_effects = [eid for eid in running_effects.keys() if 'strobe' in eid]
     for effect_id in strobo_effects:
-        if effect_id in running_effects:
-            del running_effects[effect_id]
+        stop_running_effect(effect_id)
     
     # Alle Lichter sanft ausschalten
     batch_lights_control({'on': False, 'transitiontime': 10}, 'all')  # 1 Sekunde sanfter Übergang
@@ -440,46 +606,53 @@ def init_db():
         print("   App läuft weiter ohne Datenbank-Logging")
         return False
 
+def fetch_rows(cursor, columnar=False):
+    """Ergebnis eines Tupel-Cursors als Dict-Liste oder spaltenweise zurückgeben"""
+    columns = list(cursor.column_names)
+    rows = cursor.fetchall()
+    if columnar:
+        # Spaltennamen nur einmal übertragen, Client entpackt selbst
+        return {'columns': columns, 'rows': rows}
+    return [dict(zip(columns, row)) for row in rows]
+
+POWER_LOG_INSERT = """
+    INSERT INTO power_log (timestamp, light_id, light_name, watts, brightness)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+TOTAL_CONSUMPTION_INSERT = """
+    INSERT INTO total_consumption (timestamp, total_watts, active_lights)
+    VALUES (%s, %s, %s)
+"""
+
 def log_power_consumption():
     """Logge aktuellen Stromverbrauch in Datenbank"""
     if not db_pool:
         return
         
     try:
-        conn = db_pool.get_connection()
-        cursor = conn.cursor()
-        
-        # Lichter abrufen
+        # Lichter abrufen, bevor eine Pool-Verbindung belegt wird
         lights = get_lights_raw()
         timestamp = datetime.now()
-        total_watts = 0
-        active_lights = 0
-        
-        # Einzelne Lichter loggen
-        for light_id, light in lights.items():
-            # Nur Lichter zählen die eingeschaltet sind (unabhängig von reachable-Status)
-            # Hinweis: Unreachable Lichter verbrauchen auch Strom wenn sie "on" sind
-            if light.get('state', {}).get('on', False):
-                brightness = light.get('state', {}).get('bri', 254)
-                watts = (brightness / 254) * 9  # Max 9W pro LED
-                
-                cursor.execute("""
-                    INSERT INTO power_log (timestamp, light_id, light_name, watts, brightness)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (timestamp, light_id, light['name'], watts, brightness))
-                
-                total_watts += watts
-                active_lights += 1
-        
-        # Gesamtverbrauch loggen
-        cursor.execute("""
-            INSERT INTO total_consumption (timestamp, total_watts, active_lights)
-            VALUES (%s, %s, %s)
-        """, (timestamp, total_watts, active_lights))
+        active, total_watts = estimate_power(lights)
+        rows = [(timestamp, light_id, light['name'], watts, brightness)
+                for light_id, light, _state, brightness, watts in active]
+        active_lights = len(rows)
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+        conn = db_pool.get_connection()
+        try:
+            cursor = conn.cursor()
+            
+            # Alle Lichter mit einem executemany (Multi-Row INSERT) statt einem INSERT pro Licht
+            if rows:
+                cursor.executemany(POWER_LOG_INSERT, rows)
+            
+            # Gesamtverbrauch loggen (gleiche Transaktion, ein Commit)
+            cursor.execute(TOTAL_CONSUMPTION_INSERT, (timestamp, total_watts, active_lights))
+            
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
         
         print(f"📊 Power logged: {active_lights} lights, {total_watts:.2f}W")
         
@@ -500,7 +673,7 @@ def power_logging_worker():
 @app.route('/')
 def index():
     # Check if onboarding is needed
-    if not os.path.exists('.onboarding_completed'):
+    if not ONBOARDING_COMPLETED:
         return render_template('onboarding.html')
     return render_template('index.html')
 
@@ -843,7 +1016,6 @@ def start_ultra_strobe_effect(config):
                     
             elif mode == 'disco_flash':
                 # DISCO-FLASH: Zufällige Farben, ultra-schnell
-                import random
                 colors = [
                     {'hue': 0, 'sat': 254, 'bri': bri},      # Rot
                     {'hue': 10922, 'sat': 254, 'bri': bri},  # Grün
@@ -943,8 +1115,7 @@ def start_colorloop():
 @app.route('/api/effects/<effect_id>/stop', methods=['DELETE'])
 def stop_effect(effect_id):
     """Effect stoppen"""
-    if effect_id in running_effects:
-        del running_effects[effect_id]
+    if stop_running_effect(effect_id):
         return jsonify({"success": True})
     return jsonify({"error": "Effect not found"})
 
@@ -1027,7 +1198,6 @@ def start_advanced_effect(effect_type):
 
 def start_wave_effect(effect_id, target_type, duration, speed):
     """Raumwelle - Farben laufen durch alle Lichter"""
-    import random
     
     def wave_effect():
         start_time = time.time()
@@ -1138,7 +1308,6 @@ def start_rainbow_effect(effect_id, target_type, duration, speed):
 
 def start_fire_effect(effect_id, target_type, duration, speed):
     """Feuereffekt - Warme, flackernde Farben"""
-    import random
     
     def fire_effect():
         start_time = time.time()
@@ -1220,7 +1389,6 @@ def start_sunset_effect(effect_id, target_type, duration, speed):
 
 def start_lightning_effect(effect_id, target_type, duration, speed):
     """Blitzeffekt - Zufällige Blitze"""
-    import random
     
     def lightning_effect():
         start_time = time.time()
@@ -1320,7 +1488,6 @@ def apply_effect_to_lights(target_type, target_id, state, transition_time=0):
 
 def start_plasma_effect(effect_id, config):
     """Plasma-Effekt - Sanfte Farbwellen"""
-    import math
     
     def plasma_effect():
         start_time = time.time()
@@ -1384,7 +1551,6 @@ def start_plasma_effect(effect_id, config):
 
 def start_matrix_effect(effect_id, config):
     """Matrix-Effekt - Digitaler Rain"""
-    import random
     
     def matrix_effect():
         start_time = time.time()
@@ -1456,7 +1622,6 @@ def start_matrix_effect(effect_id, config):
 
 def start_breathe_effect(effect_id, config):
     """Breathe-Effekt - Rhythmisches Pulsieren"""
-    import math
     
     def breathe_effect():
         start_time = time.time()
@@ -1505,7 +1670,6 @@ def start_breathe_effect(effect_id, config):
 
 def start_tornado_effect(effect_id, config):
     """Tornado-Effekt - Spiralförmige Farbrotation"""
-    import math
     
     def tornado_effect():
         start_time = time.time()
@@ -1563,7 +1727,6 @@ def start_tornado_effect(effect_id, config):
 
 def start_explosion_effect(effect_id, config):
     """Explosion-Effekt - Vom Zentrum ausbreitende Wellen"""
-    import math
     
     def explosion_effect():
         start_time = time.time()
@@ -1635,7 +1798,6 @@ def start_explosion_effect(effect_id, config):
 
 def start_kaleidoscope_effect(effect_id, config):
     """Kaleidoskop-Effekt - Symmetrische Farbmuster"""
-    import math
     
     def kaleidoscope_effect():
         start_time = time.time()
@@ -1699,8 +1861,6 @@ def start_kaleidoscope_effect(effect_id, config):
 
 def start_lava_effect(effect_id, config):
     """Lava-Lampe-Effekt - Langsame, organische Übergänge"""
-    import random
-    import math
     
     def lava_effect():
         start_time = time.time()
@@ -1777,7 +1937,6 @@ def start_lava_effect(effect_id, config):
 
 def start_twinkle_effect(effect_id, config):
     """Twinkle-Effekt - Zufällige Lichter blinken wie Sterne"""
-    import random
     
     def twinkle_effect():
         start_time = time.time()
@@ -1845,7 +2004,6 @@ def start_twinkle_effect(effect_id, config):
 
 def start_disco_effect(effect_id, config):
     """Disco-Effekt - Schnelle, bunte Farbwechsel"""
-    import random
     
     def disco_effect():
         start_time = time.time()
@@ -1903,7 +2061,6 @@ def start_disco_effect(effect_id, config):
 
 def start_aurora_effect(effect_id, config):
     """Aurora-Effekt - Nordlicht-ähnliche sanfte Farbwellen"""
-    import math
     
     def aurora_effect():
         start_time = time.time()
@@ -1972,7 +2129,6 @@ def start_aurora_effect(effect_id, config):
 
 def start_sparkle_effect(effect_id, config):
     """Sparkle-Effekt - Kurze, intensive Lichtblitze"""
-    import random
     
     def sparkle_effect():
         start_time = time.time()
@@ -2566,6 +2722,110 @@ def get_mood_scenes():
 audio_processor = None
 music_sync_active = False
 
+# Bridge-Befehle aus den Audio-Callbacks laufen über eine begrenzte Queue,
+# damit der Audio-Thread nie auf HTTP wartet. Ist die Bridge zu langsam,
+# werden neue Frames verworfen statt Threads aufzustauen.
+AUDIO_DISPATCH_QUEUE = queue.Queue(maxsize=32)
+AUDIO_DISPATCH_WORKERS = 4
+
+# Verzögerte Befehle (z.B. Beat-Restore) warten in einem Heap statt in einem Worker;
+# der Scheduler reiht sie erst bei Fälligkeit ein und verwirft sie nie
+_audio_delayed = []  # (due, seq, endpoint, body)
+_audio_delayed_cond = threading.Condition()
+_audio_delayed_seq = 0
+_audio_dispatch_started = False
+_audio_dispatch_lock = threading.Lock()
+
+def _audio_dispatch_worker():
+    """Arbeitet eingereihte Licht-Befehle ab"""
+    while True:
+        endpoint, body = AUDIO_DISPATCH_QUEUE.get()
+        try:
+            hue_request(endpoint, 'PUT', body)
+        except Exception as e:
+            print(f"Audio dispatch error: {e}")
+        finally:
+            AUDIO_DISPATCH_QUEUE.task_done()
+
+def _audio_delay_scheduler():
+    """Fällige verzögerte Befehle in die Dispatch-Queue übergeben (blockierend, kein Verwerfen)"""
+    while True:
+        with _audio_delayed_cond:
+            while not _audio_delayed:
+                _audio_delayed_cond.wait()
+            delay = _audio_delayed[0][0] - time.monotonic()
+            if delay > 0:
+                _audio_delayed_cond.wait(delay)
+                continue
+            _, _, endpoint, body = heapq.heappop(_audio_delayed)
+        AUDIO_DISPATCH_QUEUE.put((endpoint, body))
+
+def start_audio_dispatch():
+    """Dispatch-Worker, Scheduler und Gruppen-Sender beim ersten Musik-Sync starten (idempotent)"""
+    global _audio_dispatch_started
+    with _audio_dispatch_lock:
+        if _audio_dispatch_started:
+            return
+        for _ in range(AUDIO_DISPATCH_WORKERS):
+            threading.Thread(target=_audio_dispatch_worker, daemon=True).start()
+        threading.Thread(target=_audio_delay_scheduler, daemon=True).start()
+        threading.Thread(target=_group_action_worker, daemon=True).start()
+        _audio_dispatch_started = True
+
+# Gruppen-Befehle nimmt die Bridge nur ca. 1x pro Sekunde an: neuester Zustand gewinnt,
+# gesendet wird höchstens alle GROUP_ACTION_MIN_INTERVAL Sekunden
+GROUP_ACTION_MIN_INTERVAL = float(os.getenv('GROUP_ACTION_MIN_INTERVAL', '1.0'))
+_group_action_latest = None
+_group_action_lock = threading.Lock()
+_group_action_event = threading.Event()
+
+def _group_action_worker():
+    """Jeweils letzten vorgemerkten Gruppen-Zustand senden, dann Mindestabstand einhalten"""
+    global _group_action_latest
+    while True:
+        _group_action_event.wait()
+        with _group_action_lock:
+            body = _group_action_latest
+            _group_action_latest = None
+            _group_action_event.clear()
+        if body is None:
+            continue
+        sent_at = time.monotonic()
+        try:
+            hue_request('groups/0/action', 'PUT', body)
+        except Exception as e:
+            print(f"Group action error: {e}")
+        # Neuere Zustände überschreiben in der Zwischenzeit den Slot
+        remaining = GROUP_ACTION_MIN_INTERVAL - (time.monotonic() - sent_at)
+        if remaining > 0:
+            time.sleep(remaining)
+
+def submit_group_action(body):
+    """Gruppen-Zustand für alle Lichter vormerken (ersetzt einen noch nicht gesendeten)"""
+    global _group_action_latest
+    with _group_action_lock:
+        _group_action_latest = body
+        _group_action_event.set()
+
+def dispatch_light_command(endpoint, body, delay=0):
+    """Befehl nicht-blockierend einreihen; False wenn der Frame verworfen wurde.
+
+    Verzögerte Befehle werden immer angenommen, damit z.B. ein Restore nach einem
+    bereits gesendeten Flash nicht verloren geht.
+    """
+    global _audio_delayed_seq
+    if delay > 0:
+        with _audio_delayed_cond:
+            _audio_delayed_seq += 1
+            heapq.heappush(_audio_delayed, (time.monotonic() + delay, _audio_delayed_seq, endpoint, body))
+            _audio_delayed_cond.notify()
+        return True
+    try:
+        AUDIO_DISPATCH_QUEUE.put_nowait((endpoint, body))
+        return True
+    except queue.Full:
+        return False
+
 @app.route('/api/audio/devices', methods=['GET'])
 def get_audio_devices():
     """Liste verfügbare Audio-Geräte"""
@@ -2598,6 +2858,9 @@ def start_music_sync():
         if audio_processor:
             audio_processor.stop_processing()
         
+        # Bridge-Dispatch erst bei Bedarf starten
+        start_audio_dispatch()
+        
         # Neue Audio-Processor Instanz
         from audio_processor import AudioConfig
         config = AudioConfig()
@@ -2613,22 +2876,21 @@ def start_music_sync():
                     return
                 
                 try:
-                    lights = get_lights_raw()
-                    for light_id in lights.keys():
-                        # Bass -> Rot, Mitten -> Grün, Höhen -> Blau
-                        dominant_band = max(freq_data, key=freq_data.get)
-                        hue_value = frequency_to_hue(freq_data['dominant'])
-                        brightness = amplitude_to_brightness(
-                            max(freq_data.values()) * sensitivity
-                        )
-                        
-                        hue_request(f'lights/{light_id}/state', 'PUT', {
-                            'on': True,
-                            'hue': hue_value,
-                            'sat': 254,
-                            'bri': brightness,
-                            'transitiontime': 1
-                        })
+                    # Bass -> Rot, Mitten -> Grün, Höhen -> Blau
+                    hue_value = frequency_to_hue(freq_data['dominant'])
+                    brightness = amplitude_to_brightness(
+                        max(freq_data.values()) * sensitivity
+                    )
+                    
+                    # Alle Lichter bekommen denselben Zustand -> ein Gruppen-Request statt N,
+                    # gedrosselt auf die Rate, die die Bridge für Gruppen verkraftet
+                    submit_group_action({
+                        'on': True,
+                        'hue': hue_value,
+                        'sat': 254,
+                        'bri': brightness,
+                        'transitiontime': 1
+                    })
                 except Exception as e:
                     print(f"Frequency sync error: {e}")
             
@@ -2643,19 +2905,19 @@ def start_music_sync():
                     lights = get_lights_raw()
                     for light_id in lights.keys():
                         # Beat-Flash Effekt
-                        hue_request(f'lights/{light_id}/state', 'PUT', {
+                        endpoint = f'lights/{light_id}/state'
+                        if not dispatch_light_command(endpoint, {
                             'on': True,
                             'bri': 254,
                             'transitiontime': 0
-                        })
+                        }):
+                            continue
                         
                         # Kurze Pause dann zurück zu normalem Zustand
-                        threading.Timer(0.1, lambda: hue_request(
-                            f'lights/{light_id}/state', 'PUT', {
-                                'bri': int(150 * sensitivity),
-                                'transitiontime': 5
-                            }
-                        )).start()
+                        dispatch_light_command(endpoint, {
+                            'bri': int(150 * sensitivity),
+                            'transitiontime': 5
+                        }, delay=0.1)
                         
                 except Exception as e:
                     print(f"Beat sync error: {e}")
@@ -2680,7 +2942,7 @@ def start_music_sync():
                         energy = freq_data.get(band, 0)
                         brightness = amplitude_to_brightness(energy * sensitivity)
                         
-                        hue_request(f'lights/{light_id}/state', 'PUT', {
+                        dispatch_light_command(f'lights/{light_id}/state', {
                             'on': True,
                             'hue': colors[i % len(colors)],
                             'sat': 254,
@@ -2748,28 +3010,18 @@ def get_audio_status():
 @app.route('/api/power/current', methods=['GET'])
 def get_current_power():
     """Aktuellen Stromverbrauch berechnen (ohne DB)"""
-    lights = get_lights_raw()
-    total_consumption = 0
-    active_lights = 0
-    light_details = []
-    
-    for light_id, light in lights.items():
-        # Nur Lichter zählen die eingeschaltet sind (unabhängig von reachable-Status)
-        # Hinweis: Unreachable Lichter verbrauchen auch Strom wenn sie "on" sind
-        if light.get('state', {}).get('on', False):
-            brightness = light.get('state', {}).get('bri', 254)
-            estimated_watts = (brightness / 254) * 9  # Geschätzt: max 9W pro LED
-            total_consumption += estimated_watts
-            active_lights += 1
-            
-            light_details.append({
-                'id': light_id,
-                'name': light['name'],
-                'watts': round(estimated_watts, 2),
-                'brightness': brightness,
-                'reachable': light.get('state', {}).get('reachable', True)
-            })
-    
+    active, total_consumption = estimate_power(get_lights_raw())
+
+    light_details = [{
+        'id': light_id,
+        'name': light['name'],
+        'watts': round(watts, 2),
+        'brightness': brightness,
+        'reachable': state.get('reachable', True)
+    } for light_id, light, state, brightness, watts in active]
+
+    active_lights = len(light_details)
+
     return jsonify({
         'total_watts': round(total_consumption, 2),
         'active_lights': active_lights,
@@ -3010,7 +3262,9 @@ def get_power_detailed(timeframe):
     
     try:
         conn = db_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
+        # Tupel-Cursor: spart das Dict pro Zeile bei großen Ergebnismengen
+        cursor = conn.cursor()
+        columnar = request.args.get('format') == 'columnar'
         
         # Zeitraum bestimmen
         if timeframe == 'today':
@@ -3046,7 +3300,7 @@ def get_power_detailed(timeframe):
         """
         
         cursor.execute(query)
-        detailed_data = cursor.fetchall()
+        detailed_data = fetch_rows(cursor, columnar)
         
         # Top Verbraucher für den Zeitraum
         cursor.execute(f"""
@@ -3063,7 +3317,7 @@ def get_power_detailed(timeframe):
             ORDER BY total_kwh DESC
             LIMIT 20
         """)
-        top_lights = cursor.fetchall()
+        top_lights = fetch_rows(cursor, columnar)
         
         cursor.close()
         conn.close()
@@ -3149,20 +3403,73 @@ def get_power_lamp_data(lamp_id, timeframe):
 
 # === STATUS ===
 # === ONBOARDING API ===
+DISCOVERY_TIMEOUT = 3.0
+SSDP_ADDR = ('239.255.255.250', 1900)
+SSDP_MSEARCH = (
+    'M-SEARCH * HTTP/1.1\r\n'
+    'HOST: 239.255.255.250:1900\r\n'
+    'MAN: "ssdp:discover"\r\n'
+    'MX: 2\r\n'
+    'ST: urn:schemas-upnp-org:device:basic:1\r\n'
+    '\r\n'
+).encode()
+
+def _discover_nupnp():
+    """Philips Hue Discovery Service (N-UPnP)"""
+    response = HUE_SESSION.get('https://discovery.meethue.com/', timeout=(2, DISCOVERY_TIMEOUT))
+    return json_loads(response.content)
+
+def _discover_ssdp():
+    """SSDP M-SEARCH im lokalen Netz, nur Antworten mit hue-bridgeid Header"""
+    bridges = {}
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+        sock.settimeout(0.5)
+        sock.sendto(SSDP_MSEARCH, SSDP_ADDR)
+        deadline = time.monotonic() + DISCOVERY_TIMEOUT - 0.5
+        while time.monotonic() < deadline:
+            try:
+                data, addr = sock.recvfrom(2048)
+            except socket.timeout:
+                if bridges:
+                    break
+                continue
+            headers = {}
+            for line in data.decode(errors='ignore').split('\r\n')[1:]:
+                if ':' in line:
+                    key, value = line.split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+            if 'hue-bridgeid' in headers:
+                bridges[addr[0]] = {'id': headers['hue-bridgeid'].lower(),
+                                    'internalipaddress': addr[0]}
+    finally:
+        sock.close()
+    return list(bridges.values())
+
 @app.route('/api/onboarding/discover-bridge', methods=['GET'])
 def discover_bridge():
     """Automatische Hue Bridge Erkennung"""
     try:
-        # Philips Hue Discovery Service
-        response = requests.get('https://discovery.meethue.com/', timeout=10)
-        bridges = response.json()
+        # N-UPnP und SSDP parallel, die erste Methode mit Treffer gewinnt
+        executor = ThreadPoolExecutor(max_workers=2)
+        futures = [executor.submit(_discover_nupnp), executor.submit(_discover_ssdp)]
+        bridges = []
+        try:
+            for future in as_completed(futures, timeout=DISCOVERY_TIMEOUT):
+                try:
+                    found = future.result()
+                except Exception:
+                    continue
+                if found:
+                    bridges = found
+                    break
+        except FuturesTimeoutError:
+            pass
+        finally:
+            executor.shutdown(wait=False)
         
-        # Local network scan als Fallback
         if not bridges:
-            import subprocess
-            result = subprocess.run(['nmap', '-sn', '192.168.1.0/24'], 
-                                  capture_output=True, text=True, timeout=30)
-            # Parse nmap results for potential bridges
             bridges = [{'internalipaddress': HUE_BRIDGE_IP}]  # Fallback
             
         return jsonify({'bridges': bridges, 'success': True})
@@ -3176,12 +3483,12 @@ def generate_api_key():
     bridge_ip = data.get('bridge_ip', HUE_BRIDGE_IP)
     
     try:
-        response = requests.post(
+        response = HUE_SESSION.post(
             f"http://{bridge_ip}/api",
             json={"devicetype": "HueControllerProX#RaspberryPi"},
-            timeout=10
+            timeout=(2, 10)
         )
-        result = response.json()[0]
+        result = json_loads(response.content)[0]
         
         if 'error' in result:
             if result['error']['type'] == 101:
@@ -3210,8 +3517,8 @@ def onboarding_test_hue_connection():
     username = data.get('username')
     
     try:
-        response = requests.get(f"http://{bridge_ip}/api/{username}/lights", timeout=5)
-        lights = response.json()
+        response = HUE_SESSION.get(f"http://{bridge_ip}/api/{username}/lights", timeout=(2, 5))
+        lights = json_loads(response.content)
         
         if isinstance(lights, dict) and 'error' not in str(lights):
             return jsonify({
@@ -3228,6 +3535,7 @@ def onboarding_test_hue_connection():
 @app.route('/api/onboarding/save-config', methods=['POST'])
 def save_onboarding_config():
     """Speichere Onboarding-Konfiguration"""
+    global ONBOARDING_COMPLETED
     data = request.get_json()
     
     try:
@@ -3245,57 +3553,85 @@ def save_onboarding_config():
             'HUE_USERNAME': data.get('username')
         }
         
+        if env_content and not env_content[-1].endswith('\n'):
+            env_content[-1] += '\n'
+        
+        # Key -> Zeilennummer (erstes Vorkommen), Kommentare bleiben erhalten
+        index = {}
+        for i, line in enumerate(env_content):
+            if '=' in line:
+                index.setdefault(line.split('=', 1)[0], i)
+        
         for key, value in config_map.items():
-            found = False
-            for i, line in enumerate(env_content):
-                if line.startswith(f"{key}="):
-                    env_content[i] = f"{key}={value}\n"
-                    found = True
-                    break
-            if not found:
+            if value is None:
+                continue
+            i = index.get(key)
+            if i is not None:
+                env_content[i] = f"{key}={value}\n"
+            else:
                 env_content.append(f"{key}={value}\n")
+            os.environ[key] = value
         
-        # Write back to file
-        with open(env_path, 'w') as f:
-            f.writelines(env_content)
+        # Atomar zurückschreiben, damit ein Absturz die .env nicht zerstört
+        write_text_atomic(env_path, ''.join(env_content))
+        # Health-Probes sollen die neue Bridge-Konfiguration sofort verwenden
+        reload_env()
         
         # Mark onboarding as completed
-        with open('.onboarding_completed', 'w') as f:
-            f.write(str(datetime.now()))
+        write_text_atomic('.onboarding_completed', str(datetime.now()))
+        ONBOARDING_COMPLETED = True
+        invalidate_cache('api_status')
         
         return jsonify({'success': True, 'message': 'Konfiguration gespeichert!'})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@lru_cache(maxsize=2)
+def _status_prefix(database_enabled):
+    """Statischen Teil der Status-Antwort einmal pro DB-Zustand kodieren (ohne schließende Klammer)"""
+    return encode_json({
+        'status': 'running',
+        'hue_bridge_ip': HUE_BRIDGE_IP,
+        'database': 'enabled' if database_enabled else 'disabled',
+        'features': {
+            'basic_control': True,
+            'scenes': True,
+            'effects': True,
+            'timers': True,
+            'sensors': True,
+            'global_control': True,
+            'power_estimation': True,
+            'power_logging': database_enabled
+        }
+    })[:-1]
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """API Status"""
+    cached = get_cache('api_status', STATUS_CACHE_TTL)
+    if cached:
+        return cached_json_response(cached, STATUS_CACHE_TTL)
+    
     try:
-        # Test Hue Connection
-        lights = get_lights_raw()
+        # Test Hue Connection (mit harter Obergrenze für die Antwortzeit)
+        try:
+            lights = HEALTH_EXECUTOR.submit(get_lights_raw).result(timeout=HEALTH_PROBE_TIMEOUT)
+        except Exception:
+            lights = {}
         hue_connected = len(lights) > 0 and 'error' not in str(lights)
         
-        return jsonify({
-            'status': 'running',
-            'hue_bridge_ip': HUE_BRIDGE_IP,
+        # Nur die veränderlichen Felder pro Anfrage kodieren
+        volatile = {
             'hue_connected': hue_connected,
             'lights_count': len(lights) if hue_connected else 0,
             'active_effects': len(running_effects),
             'active_timers': len(active_timers),
-            'database': 'enabled' if db_pool else 'disabled',
-            'onboarding_completed': os.path.exists('.onboarding_completed'),
-            'features': {
-                'basic_control': True,
-                'scenes': True,
-                'effects': True,
-                'timers': True,
-                'sensors': True,
-                'global_control': True,
-                'power_estimation': True,
-                'power_logging': db_pool is not None
-            }
-        })
+            'onboarding_completed': ONBOARDING_COMPLETED
+        }
+        body = f"{_status_prefix(db_pool is not None)},{encode_json(volatile)[1:]}"
+        set_cache('api_status', body, STATUS_CACHE_TTL)
+        return cached_json_response(body, STATUS_CACHE_TTL)
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
@@ -3305,12 +3641,17 @@ def get_status():
 @smart_error_handler('system_health_check')
 def system_health():
     """System-Gesundheitscheck mit Diagnose"""
-    health_report = get_system_health()
-    return jsonify({
+    cached = get_cache('api_system_health', STATUS_CACHE_TTL)
+    if cached:
+        return cached_json_response(cached, STATUS_CACHE_TTL)
+    
+    body = encode_json({
         'success': True,
-        'health': health_report,
+        'health': get_system_health(),
         'timestamp': datetime.now().isoformat()
     })
+    set_cache('api_system_health', body, STATUS_CACHE_TTL)
+    return cached_json_response(body, STATUS_CACHE_TTL)
 
 @app.route('/api/system/errors', methods=['GET'])
 @smart_error_handler('error_statistics')
@@ -3323,6 +3664,82 @@ def error_statistics():
         'timestamp': datetime.now().isoformat()
     })
 
+def _probe_hue():
+    """Licht-spezifische Diagnose -> (tests, solutions)"""
+    tests, solutions = {}, []
+    try:
+        lights = hue_request('lights')
+        if isinstance(lights, list) and len(lights) > 0 and 'error' in lights[0]:
+            tests['hue_api'] = 'authentication_failed'
+            solutions.extend([
+                'API-Schlüssel erneuern',
+                'Bridge-Button drücken und neu verbinden'
+            ])
+        else:
+            tests['hue_api'] = 'ok'
+            tests['lights_count'] = len(lights) if isinstance(lights, dict) else 0
+    except Exception as e:
+        tests['hue_api'] = f'connection_error: {str(e)}'
+        solutions.append('Bridge-IP und Netzwerkverbindung prüfen')
+    return tests, solutions
+
+def _probe_db():
+    """Datenbank-spezifische Diagnose -> (tests, solutions)"""
+    tests, solutions = {}, []
+    try:
+        if db_pool:
+            conn = db_pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM power_log")
+            count = cursor.fetchone()[0]
+            tests['database_connection'] = 'ok'
+            tests['power_log_entries'] = count
+            conn.close()
+        else:
+            tests['database_connection'] = 'pool_not_initialized'
+            solutions.append('Datenbank-Konfiguration prüfen')
+    except Exception as e:
+        tests['database_connection'] = f'error: {str(e)}'
+        solutions.extend([
+            'MariaDB Service prüfen: systemctl status mariadb',
+            'Datenbank-Credentials überprüfen'
+        ])
+    return tests, solutions
+
+def _probe_audio():
+    """Audio-spezifische Diagnose -> (tests, solutions)"""
+    tests, solutions = {}, []
+    if pyaudio is None:
+        tests['pyaudio_available'] = False
+        solutions.append('Audio-Libraries installieren: pip install pyaudio scipy')
+        return tests, solutions
+    
+    try:
+        p = pyaudio.PyAudio()
+        device_count = p.get_device_count()
+        devices = []
+        for i in range(device_count):
+            info = p.get_device_info_by_index(i)
+            if info['maxInputChannels'] > 0:
+                devices.append({
+                    'index': i,
+                    'name': info['name'],
+                    'channels': info['maxInputChannels']
+                })
+        p.terminate()
+        tests['audio_devices'] = devices
+        tests['pyaudio_available'] = True
+    except Exception as e:
+        tests['audio_error'] = str(e)
+        solutions.append('Audio-System-Konfiguration prüfen')
+    return tests, solutions
+
+DIAGNOSE_PROBES = {
+    'lights': _probe_hue,
+    'database': _probe_db,
+    'audio': _probe_audio
+}
+
 @app.route('/api/system/diagnose', methods=['POST'])
 @smart_error_handler('system_diagnosis')
 def diagnose_issue():
@@ -3337,68 +3754,21 @@ def diagnose_issue():
         'solutions': []
     }
     
-    if issue_type == 'lights':
-        # Licht-spezifische Diagnose
-        try:
-            lights = hue_request('lights')
-            if isinstance(lights, list) and len(lights) > 0 and 'error' in lights[0]:
-                diagnosis['tests']['hue_api'] = 'authentication_failed'
-                diagnosis['solutions'].extend([
-                    'API-Schlüssel erneuern',
-                    'Bridge-Button drücken und neu verbinden'
-                ])
-            else:
-                diagnosis['tests']['hue_api'] = 'ok'
-                diagnosis['tests']['lights_count'] = len(lights) if isinstance(lights, dict) else 0
-        except Exception as e:
-            diagnosis['tests']['hue_api'] = f'connection_error: {str(e)}'
-            diagnosis['solutions'].append('Bridge-IP und Netzwerkverbindung prüfen')
-    
-    elif issue_type == 'database':
-        # Datenbank-spezifische Diagnose
-        try:
-            if db_pool:
-                conn = db_pool.get_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM power_log")
-                count = cursor.fetchone()[0]
-                diagnosis['tests']['database_connection'] = 'ok'
-                diagnosis['tests']['power_log_entries'] = count
-                conn.close()
-            else:
-                diagnosis['tests']['database_connection'] = 'pool_not_initialized'
-                diagnosis['solutions'].append('Datenbank-Konfiguration prüfen')
-        except Exception as e:
-            diagnosis['tests']['database_connection'] = f'error: {str(e)}'
-            diagnosis['solutions'].extend([
-                'MariaDB Service prüfen: systemctl status mariadb',
-                'Datenbank-Credentials überprüfen'
-            ])
+    # 'general' prüft alle Bereiche parallel, sonst nur den angefragten
+    if issue_type == 'general':
+        probes = DIAGNOSE_PROBES
+    elif issue_type in DIAGNOSE_PROBES:
+        probes = {issue_type: DIAGNOSE_PROBES[issue_type]}
+    else:
+        probes = {}
     
-    elif issue_type == 'audio':
-        # Audio-spezifische Diagnose
-        try:
-            import pyaudio
-            p = pyaudio.PyAudio()
-            device_count = p.get_device_count()
-            devices = []
-            for i in range(device_count):
-                info = p.get_device_info_by_index(i)
-                if info['maxInputChannels'] > 0:
-                    devices.append({
-                        'index': i,
-                        'name': info['name'],
-                        'channels': info['maxInputChannels']
-                    })
-            p.terminate()
-            diagnosis['tests']['audio_devices'] = devices
-            diagnosis['tests']['pyaudio_available'] = True
-        except ImportError:
-            diagnosis['tests']['pyaudio_available'] = False
-            diagnosis['solutions'].append('Audio-Libraries installieren: pip install pyaudio scipy')
-        except Exception as e:
-            diagnosis['tests']['audio_error'] = str(e)
-            diagnosis['solutions'].append('Audio-System-Konfiguration prüfen')
+    for name, result in run_probes(probes).items():
+        if isinstance(result, tuple):
+            tests, solutions = result
+            diagnosis['tests'].update(tests)
+            diagnosis['solutions'].extend(solutions)
+        else:
+            diagnosis['tests'][f'{name}_probe'] = result
     
     return jsonify({
         'success': True,
@@ -3424,7 +3794,8 @@ def recovery_action():
         # Alle Effekte stoppen und zurücksetzen
         global running_effects
         stopped_effects = list(running_effects.keys())
-        running_effects.clear()
+        for effect_id in stopped_effects:
+            stop_running_effect(effect_id)
         recovery_result['success'] = True
         recovery_result['message'] = f'Alle Effekte gestoppt ({len(stopped_effects)} Effekte)'
         recovery_result['details']['stopped_effects'] = stopped_effects
@@ -3435,7 +3806,9 @@ def recovery_action():
             global db_pool
             if db_pool:
                 db_pool = None
-            init_db()
+            if init_db():
+                # Tracking-Queues brauchen den Flusher, auch wenn die DB beim Start fehlte
+                start_usage_flusher()
             recovery_result['success'] = True
             recovery_result['message'] = 'Datenbank-Pool neu initialisiert'
         except Exception as e:
@@ -3481,28 +3854,29 @@ def recovery_action():
 @smart_error_handler('effect_builder_templates')
 def get_effect_templates():
     """Verfügbare Effekt-Templates abrufen"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
-    templates = effect_builder.get_templates()
-    return jsonify({
+    return app.response_class(_effect_templates_body(), mimetype='application/json')
+
+@lru_cache(maxsize=1)
+def _effect_templates_body():
+    """Templates sind unveränderlich -> Antwort nur einmal kodieren"""
+    return encode_json({
         'success': True,
-        'templates': templates
+        'templates': effect_builder.get_templates()
     })
 
 @app.route('/api/effect-builder/effects', methods=['GET'])
 @smart_error_handler('effect_builder_list')
 def list_custom_effects():
     """Alle Custom-Effekte auflisten"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     category = request.args.get('category')
     author = request.args.get('author')
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', 0, type=int)
     
-    effects = effect_builder.list_effects(category, author)
+    if limit is not None:
+        limit = max(limit, 0)
+    
+    effects = effect_builder.list_effects(category, author, limit, max(offset, 0))
     return jsonify({
         'success': True,
         'effects': effects,
@@ -3513,10 +3887,6 @@ def list_custom_effects():
 @smart_error_handler('effect_builder_create')
 def create_custom_effect():
     """Neuen Custom-Effekt erstellen"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     data = request.get_json()
     name = data.get('name', '').strip()
     description = data.get('description', '').strip()
@@ -3549,10 +3919,6 @@ def create_custom_effect():
 @smart_error_handler('effect_builder_get')
 def get_custom_effect(effect_id):
     """Custom-Effekt laden"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     effect = effect_builder.load_effect(effect_id)
     if not effect:
         return jsonify({
@@ -3569,7 +3935,7 @@ def get_custom_effect(effect_id):
             'category': effect.category,
             'author': effect.author,
             'created_at': effect.created_at,
-            'steps': [asdict(step) for step in effect.steps],
+            'steps': [step_to_dict(step) for step in effect.steps],
             'tags': effect.tags,
             'preview_colors': effect.preview_colors,
             'is_public': effect.is_public
@@ -3580,10 +3946,6 @@ def get_custom_effect(effect_id):
 @smart_error_handler('effect_builder_add_step')
 def add_effect_step(effect_id):
     """Schritt zu Effekt hinzufügen"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     effect = effect_builder.load_effect(effect_id)
     if not effect:
         return jsonify({
@@ -3607,11 +3969,11 @@ def add_effect_step(effect_id):
     
     step = effect_builder.add_step(effect, step_type, duration, parameters, target_type, target_id)
     
-    # Effekt speichern
-    effect_builder.save_effect(effect)
-    
-    # Preview-Farben aktualisieren
-    effect_builder.generate_preview_colors(effect)
+    # Preview-Farben aktualisieren, dann einmal speichern
+    try:
+        effect_builder.generate_preview_colors(effect)
+    except Exception as e:
+        print(f"Preview colors error: {e}")
     effect_builder.save_effect(effect)
     
     return jsonify({
@@ -3631,10 +3993,6 @@ def add_effect_step(effect_id):
 @smart_error_handler('effect_builder_remove_step')
 def remove_effect_step(effect_id, step_id):
     """Schritt aus Effekt entfernen"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     effect = effect_builder.load_effect(effect_id)
     if not effect:
         return jsonify({
@@ -3649,11 +4007,11 @@ def remove_effect_step(effect_id, step_id):
             'error': 'Schritt nicht gefunden'
         }), 404
     
-    # Effekt speichern
-    effect_builder.save_effect(effect)
-    
-    # Preview-Farben aktualisieren
-    effect_builder.generate_preview_colors(effect)
+    # Preview-Farben aktualisieren, dann einmal speichern
+    try:
+        effect_builder.generate_preview_colors(effect)
+    except Exception as e:
+        print(f"Preview colors error: {e}")
     effect_builder.save_effect(effect)
     
     return jsonify({
@@ -3666,10 +4024,6 @@ def remove_effect_step(effect_id, step_id):
 @smart_error_handler('effect_builder_reorder')
 def reorder_effect_steps(effect_id):
     """Schritte neu ordnen"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     effect = effect_builder.load_effect(effect_id)
     if not effect:
         return jsonify({
@@ -3699,10 +4053,6 @@ def reorder_effect_steps(effect_id):
 @smart_error_handler('effect_builder_validate')
 def validate_custom_effect(effect_id):
     """Effekt validieren"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     effect = effect_builder.load_effect(effect_id)
     if not effect:
         return jsonify({
@@ -3720,10 +4070,6 @@ def validate_custom_effect(effect_id):
 @smart_error_handler('effect_builder_execute')
 def execute_custom_effect(effect_id):
     """Custom-Effekt ausführen"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     effect = effect_builder.load_effect(effect_id)
     if not effect:
         return jsonify({
@@ -3740,40 +4086,66 @@ def execute_custom_effect(effect_id):
             'issues': validation['issues']
         }), 400
     
+    # Maximale Laufzeit (Sekunden) statt fester Schleifen-Obergrenze
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({
+            'success': False,
+            'error': 'Request-Body muss ein JSON-Objekt sein'
+        }), 400
+    try:
+        max_runtime = float(data.get('max_runtime_seconds', CUSTOM_EFFECT_MAX_RUNTIME))
+    except (TypeError, ValueError):
+        max_runtime = None
+    # Obergrenze bleibt die einzige Absicherung gegen endlos laufende Effekte
+    if (max_runtime is None or not math.isfinite(max_runtime)
+            or not 0 < max_runtime <= CUSTOM_EFFECT_MAX_RUNTIME):
+        return jsonify({
+            'success': False,
+            'error': f'max_runtime_seconds muss eine Zahl zwischen 0 und {CUSTOM_EFFECT_MAX_RUNTIME} sein'
+        }), 400
+    
     # Effekt in separatem Thread ausführen
     def execute_effect():
         effect_execution_id = str(uuid.uuid4())
+        stop_event = threading.Event()
         running_effects[effect_execution_id] = {
             'type': 'custom',
             'name': effect.name,
-            'start_time': time.time()
+            'start_time': time.time(),
+            'stop_event': stop_event
         }
         
         try:
-            import random
-            loop_count = 0
-            max_loops = 1000  # Sicherheitsgrenze
+            deadline = time.monotonic() + max_runtime
+            has_loop = any(s.type == 'loop' for s in effect.steps)
             
-            while effect_execution_id in running_effects and loop_count < max_loops:
+            # Licht-IDs für target 'all' zwischenspeichern statt pro Schritt abzufragen
+            all_lights = None
+            all_lights_fetched = 0
+            
+            # Noch nicht gesendete Zustände pro Licht (light_id -> Befehl)
+            pending = {}
+            last_flush = 0
+            
+            while not stop_event.is_set() and time.monotonic() < deadline:
+                waited = False
                 for step in effect.steps:
-                    if effect_execution_id not in running_effects:
+                    if stop_event.is_set() or time.monotonic() >= deadline:
                         break
                     
                     if step.type == 'loop':
-                        count = step.parameters.get('count', 1)
-                        if count == -1:  # Endlos
-                            loop_count += 1
-                            if loop_count >= max_loops:
-                                break
                         continue
                     
                     # Ziel-Lichter bestimmen
                     if step.target_type == 'all':
-                        lights = hue_request('lights')
-                        if isinstance(lights, dict):
-                            target_lights = list(lights.keys())
-                        else:
+                        if all_lights is None or time.monotonic() - all_lights_fetched > ALL_LIGHTS_REFRESH_SECONDS:
+                            lights = hue_request('lights')
+                            all_lights = list(lights.keys()) if isinstance(lights, dict) else None
+                            all_lights_fetched = time.monotonic()
+                        if all_lights is None:
                             continue
+                        target_lights = all_lights
                     elif step.target_type == 'light':
                         target_lights = [step.target_id] if step.target_id else []
                     elif step.target_type == 'group':
@@ -3781,19 +4153,17 @@ def execute_custom_effect(effect_id):
                     else:
                         continue
                     
-                    # Schritt ausführen
+                    # Schritt ausführen: Befehle sammeln, dann parallel senden
+                    commands = []
                     for light_id in target_lights:
-                        if effect_execution_id not in running_effects:
-                            break
-                        
                         command = {}
                         
                         if step.type in ['color', 'brightness', 'transition']:
                             params = step.parameters.copy()
                             
-                            # Zufällige Werte behandeln
+                            # Zufällige Werte behandeln (16 Zufallsbits = voller Hue-Bereich 0-65535)
                             if params.get('hue') == 'random':
-                                params['hue'] = random.randint(0, 65535)
+                                params['hue'] = random.getrandbits(16)
                             
                             command.update(params)
                             
@@ -3802,22 +4172,43 @@ def execute_custom_effect(effect_id):
                                 command['transitiontime'] = int(step.duration * 10)
                         
                         if command:
-                            hue_request(f'lights/{light_id}/state', 'PUT', command)
+                            commands.append((light_id, command))
                     
-                    # Warten für Schritt-Dauer
+                    # Befehle pro Licht zusammenführen; Übergänge nicht mit älteren Zuständen mischen
+                    for light_id, command in commands:
+                        if 'transitiontime' in command and light_id in pending:
+                            put_light_states(list(pending.items()))
+                            pending = {}
+                        pending.setdefault(light_id, {}).update(command)
+                    
+                    # Senden an Schrittgrenzen mit Wartezeit oder spätestens nach dem Coalesce-Fenster
+                    if pending and not stop_event.is_set() and (
+                            step.duration > 0 or time.monotonic() - last_flush >= LIGHT_COALESCE_WINDOW):
+                        put_light_states(list(pending.items()))
+                        pending = {}
+                        last_flush = time.monotonic()
+                    
+                    # Warten für Schritt-Dauer, bricht beim Stoppen sofort ab
                     if step.duration > 0:
-                        time.sleep(step.duration)
+                        waited = True
+                        if stop_event.wait(step.duration):
+                            break
                 
                 # Loop prüfen
-                has_loop = any(s.type == 'loop' for s in effect.steps)
                 if not has_loop:
                     break
+                
+                # Durchlauf ohne jede Wartezeit (Dauer 0, nur Gruppen, Bridge nicht erreichbar):
+                # kurz pausieren statt die CPU bis zur Deadline voll auszulasten
+                if not waited and stop_event.wait(LIGHT_COALESCE_WINDOW):
+                    break
+            
+            if pending and not stop_event.is_set():
+                put_light_states(list(pending.items()))
                     
         finally:
-            if effect_execution_id in running_effects:
-                del running_effects[effect_execution_id]
+            running_effects.pop(effect_execution_id, None)
     
-    import threading
     threading.Thread(target=execute_effect, daemon=True).start()
     
     return jsonify({
@@ -3831,10 +4222,6 @@ def execute_custom_effect(effect_id):
 @smart_error_handler('effect_builder_delete')
 def delete_custom_effect(effect_id):
     """Custom-Effekt löschen"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     deleted = effect_builder.delete_effect(effect_id)
     if not deleted:
         return jsonify({
@@ -3851,10 +4238,6 @@ def delete_custom_effect(effect_id):
 @smart_error_handler('effect_builder_from_template')
 def create_effect_from_template():
     """Effekt aus Template erstellen"""
-    global effect_builder
-    if not effect_builder:
-        effect_builder = EffectBuilder(db_pool)
-    
     data = request.get_json()
     template_key = data.get('template')
     name = data.get('name', '').strip()
@@ -3896,6 +4279,16 @@ def create_effect_from_template():
 
 # === EXTENDED DATABASE FEATURES ===
 
+def _usage_rows(cursor):
+    """Zeilen (type, name, usage_count, avg_duration) als Dicts direkt vom Cursor liefern"""
+    for usage_type, name, usage_count, avg_duration in cursor:
+        yield {
+            'type': usage_type,
+            'name': name,
+            'usage_count': usage_count,
+            'avg_duration': float(avg_duration) if avg_duration else 0
+        }
+
 @app.route('/api/analytics/usage', methods=['GET'])
 @smart_error_handler('usage_analytics')
 def get_usage_analytics():
@@ -3906,6 +4299,11 @@ def get_usage_analytics():
             'error': 'Database nicht verfügbar'
         }), 503
     
+    # 30-Tage-Aggregationen ändern sich kaum -> längere TTL
+    cached = get_cache('api_usage_analytics', ANALYTICS_CACHE_TTL)
+    if cached:
+        return cached_json_response(cached, ANALYTICS_CACHE_TTL)
+    
     try:
         conn = db_pool.get_connection()
         cursor = conn.cursor()
@@ -3920,15 +4318,7 @@ def get_usage_analytics():
             ORDER BY usage_count DESC
             LIMIT 10
         """)
-        popular_scenes = [
-            {
-                'type': row[0],
-                'name': row[1],
-                'usage_count': row[2],
-                'avg_duration': float(row[3]) if row[3] else 0
-            }
-            for row in cursor.fetchall()
-        ]
+        popular_scenes = list(_usage_rows(cursor))
         
         # Effect Usage Analytics
         cursor.execute("""
@@ -3940,15 +4330,7 @@ def get_usage_analytics():
             ORDER BY usage_count DESC
             LIMIT 10
         """)
-        popular_effects = [
-            {
-                'type': row[0],
-                'name': row[1],
-                'usage_count': row[2],
-                'avg_duration': float(row[3]) if row[3] else 0
-            }
-            for row in cursor.fetchall()
-        ]
+        popular_effects = list(_usage_rows(cursor))
         
         # System Health Trend
         cursor.execute("""
@@ -3957,11 +4339,11 @@ def get_usage_analytics():
             WHERE check_time >= DATE_SUB(NOW(), INTERVAL 7 DAY)
             GROUP BY overall_status
         """)
-        health_trend = {row[0]: row[1] for row in cursor.fetchall()}
+        health_trend = {row[0]: row[1] for row in cursor}
         
         conn.close()
         
-        return jsonify({
+        body = encode_json({
             'success': True,
             'analytics': {
                 'popular_scenes': popular_scenes,
@@ -3970,6 +4352,8 @@ def get_usage_analytics():
                 'period': '30 days'
             }
         })
+        set_cache('api_usage_analytics', body, ANALYTICS_CACHE_TTL)
+        return cached_json_response(body, ANALYTICS_CACHE_TTL)
         
     except Exception as e:
         return jsonify({
@@ -3987,8 +4371,19 @@ def get_user_preferences():
             'preferences': {}  # Fallback ohne DB
         })
     
+    user_id = request.args.get('user_id', 'default')
+    
+    # UI-Auto-Refresh fragt wiederholt ab -> aus dem Cache bedienen
+    cache_key = f'user_preferences:{user_id}'
+    preferences = get_cache(cache_key, PREFERENCES_CACHE_TTL)
+    if preferences is not None:
+        return jsonify({
+            'success': True,
+            'preferences': preferences,
+            'user_id': user_id
+        })
+    
     try:
-        user_id = request.args.get('user_id', 'default')
         conn = db_pool.get_connection()
         cursor = conn.cursor()
         
@@ -3998,23 +4393,14 @@ def get_user_preferences():
             WHERE user_id = %s
         """, (user_id,))
         
-        preferences = {}
-        for row in cursor.fetchall():
-            key, value, data_type = row
-            
-            # Datentyp-Konvertierung
-            if data_type == 'int':
-                preferences[key] = int(value)
-            elif data_type == 'float':
-                preferences[key] = float(value)
-            elif data_type == 'bool':
-                preferences[key] = value.lower() == 'true'
-            elif data_type == 'json':
-                preferences[key] = json.loads(value)
-            else:
-                preferences[key] = value
+        # Zeilen direkt vom Cursor streamen statt fetchall()
+        preferences = {
+            key: parse_typed_value(value, data_type)
+            for key, value, data_type in cursor
+        }
         
         conn.close()
+        set_cache(cache_key, preferences, PREFERENCES_CACHE_TTL)
         
         return jsonify({
             'success': True,
@@ -4046,36 +4432,25 @@ def set_user_preferences():
         conn = db_pool.get_connection()
         cursor = conn.cursor()
         
-        for key, value in preferences.items():
-            # Datentyp bestimmen
-            if isinstance(value, bool):
-                data_type = 'bool'
-                value_str = 'true' if value else 'false'
-            elif isinstance(value, int):
-                data_type = 'int'
-                value_str = str(value)
-            elif isinstance(value, float):
-                data_type = 'float'
-                value_str = str(value)
-            elif isinstance(value, (dict, list)):
-                data_type = 'json'
-                value_str = json.dumps(value)
-            else:
-                data_type = 'string'
-                value_str = str(value)
-            
-            # Upsert
-            cursor.execute("""
+        rows = [
+            (user_id, key, *serialize_typed_value(value))
+            for key, value in preferences.items()
+        ]
+        
+        # Ein Batch-Upsert statt eines Round-Trips pro Key
+        if rows:
+            cursor.executemany("""
                 INSERT INTO user_preferences (user_id, preference_key, preference_value, data_type)
                 VALUES (%s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE 
                 preference_value = VALUES(preference_value),
                 data_type = VALUES(data_type),
                 updated_at = CURRENT_TIMESTAMP
-            """, (user_id, key, value_str, data_type))
+            """, rows)
         
         conn.commit()
         conn.close()
+        invalidate_cache(f'user_preferences:{user_id}', exact=True)
         
         return jsonify({
             'success': True,
@@ -4099,12 +4474,22 @@ def get_system_settings():
             'settings': {}
         })
     
+    include_private = request.args.get('include_private', 'false').lower() == 'true'
+    values_only = request.args.get('values_only', 'false').lower() == 'true'
+    
+    # Settings ändern sich selten -> aus dem Cache bedienen
+    cache_key = 'system_settings_all' if include_private else 'system_settings_public'
+    if values_only:
+        cache_key += '_values'
+    # Fertig kodierten Body cachen, Treffer serialisieren nicht erneut
+    body = get_cache(cache_key, SETTINGS_CACHE_TTL)
+    if body is not None:
+        return app.response_class(body, mimetype='application/json')
+    
     try:
         conn = db_pool.get_connection()
         cursor = conn.cursor()
         
-        include_private = request.args.get('include_private', 'false').lower() == 'true'
-        
         if include_private:
             cursor.execute("""
                 SELECT setting_key, setting_value, data_type, description 
@@ -4117,33 +4502,29 @@ def get_system_settings():
                 WHERE is_public = TRUE
             """)
         
-        settings = {}
-        for row in cursor.fetchall():
-            key, value, data_type, description = row
-            
-            # Datentyp-Konvertierung
-            if data_type == 'int':
-                parsed_value = int(value)
-            elif data_type == 'float':
-                parsed_value = float(value)
-            elif data_type == 'bool':
-                parsed_value = value.lower() == 'true'
-            elif data_type == 'json':
-                parsed_value = json.loads(value)
-            else:
-                parsed_value = value
-            
-            settings[key] = {
-                'value': parsed_value,
-                'description': description
+        if values_only:
+            # Nur Werte: spart das verschachtelte Dict pro Zeile
+            settings = {
+                key: parse_typed_value(value, data_type)
+                for key, value, data_type, _ in cursor
+            }
+        else:
+            settings = {
+                key: {
+                    'value': parse_typed_value(value, data_type),
+                    'description': description
+                }
+                for key, value, data_type, description in cursor
             }
         
         conn.close()
         
-        return jsonify({
+        body = encode_json({
             'success': True,
             'settings': settings
         })
+        set_cache(cache_key, body, SETTINGS_CACHE_TTL)
+        return app.response_class(body, mimetype='application/json')
         
     except Exception as e:
         return jsonify({
@@ -4151,45 +4532,112 @@ def get_system_settings():
             'error': f'Settings-Fehler: {str(e)}'
         }), 500
 
+# Usage-Tracking: Zeilen sammeln und gebündelt schreiben statt Connect/Insert/Commit pro Aufruf
+USAGE_FLUSH_INTERVAL = 1.0
+USAGE_FLUSH_BATCH = 100
+scene_usage_queue = queue.Queue(maxsize=10000)
+effect_usage_queue = queue.Queue(maxsize=10000)
+health_log_queue = queue.Queue(maxsize=1000)
+usage_flush_thread = None
+usage_flush_thread_lock = threading.Lock()
+
+SCENE_USAGE_INSERT = """
+    INSERT INTO scene_usage (scene_type, scene_id, scene_name, user_id)
+    VALUES (%s, %s, %s, %s)
+"""
+EFFECT_USAGE_INSERT = """
+    INSERT INTO effect_usage (effect_type, effect_id, effect_name, user_id, 
+                            target_type, target_count)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+HEALTH_LOG_INSERT = """
+    INSERT INTO system_health_log 
+    (overall_status, hue_bridge_status, database_status, audio_system_status,
+     active_effects_count, memory_usage_mb, cpu_usage_percent, uptime_seconds,
+     recommendations_json)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def _enqueue_usage(usage_queue, row):
+    """Zeile einreihen; bei voller Queue verwerfen (Tracking darf nie blockieren)"""
+    try:
+        usage_queue.put_nowait(row)
+    except queue.Full:
+        pass
+
+def _drain_queue(usage_queue, limit):
+    """Bis zu limit Zeilen ohne Warten aus der Queue holen"""
+    rows = []
+    while len(rows) < limit:
+        try:
+            rows.append(usage_queue.get_nowait())
+        except queue.Empty:
+            break
+    return rows
+
+def _open_tracking_connection():
+    """Eigene Autocommit-Verbindung für den Flusher (belegt keinen Pool-Slot)"""
+    config = {key: value for key, value in MYSQL_CONFIG.items() if not key.startswith('pool_')}
+    return mysql.connector.connect(autocommit=True, **config)
+
+def usage_flush_worker():
+    """Gesammelte Usage-Zeilen periodisch per executemany schreiben"""
+    conn = None
+    cursor = None
+    while True:
+        batches = [
+            (SCENE_USAGE_INSERT, _drain_queue(scene_usage_queue, USAGE_FLUSH_BATCH)),
+            (EFFECT_USAGE_INSERT, _drain_queue(effect_usage_queue, USAGE_FLUSH_BATCH)),
+            (HEALTH_LOG_INSERT, _drain_queue(health_log_queue, USAGE_FLUSH_BATCH))
+        ]
+        batches = [(sql, rows) for sql, rows in batches if rows]
+        
+        if batches and db_pool:
+            try:
+                # Verbindung und Cursor einmal öffnen und über alle Flushes wiederverwenden
+                if conn is None:
+                    conn = _open_tracking_connection()
+                    cursor = conn.cursor()
+                for sql, rows in batches:
+                    cursor.executemany(sql, rows)
+            except mysql.connector.Error:
+                # Verbindung beim nächsten Flush neu aufbauen
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+                cursor = None
+            except Exception:
+                pass  # Silent fail für Tracking
+        
+        # Volle Batches sofort weiter abarbeiten, sonst bis zum nächsten Intervall warten
+        if not any(len(rows) == USAGE_FLUSH_BATCH for _, rows in batches):
+            time.sleep(USAGE_FLUSH_INTERVAL)
+
+def start_usage_flusher():
+    """Usage-Flusher starten, falls er noch nicht läuft (Start und DB-Recovery)"""
+    global usage_flush_thread
+    with usage_flush_thread_lock:
+        if usage_flush_thread is None or not usage_flush_thread.is_alive():
+            usage_flush_thread = threading.Thread(target=usage_flush_worker, daemon=True)
+            usage_flush_thread.start()
+
 def track_scene_usage(scene_type: str, scene_id: str, scene_name: str, user_id: str = 'default'):
-    """Scene-Usage in Datenbank loggen"""
+    """Scene-Usage zum gebündelten Schreiben vormerken"""
     if not db_pool:
         return
     
-    try:
-        conn = db_pool.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO scene_usage (scene_type, scene_id, scene_name, user_id)
-            VALUES (%s, %s, %s, %s)
-        """, (scene_type, scene_id, scene_name, user_id))
-        
-        conn.commit()
-        conn.close()
-    except Exception:
-        pass  # Silent fail für Tracking
+    _enqueue_usage(scene_usage_queue, (scene_type, scene_id, scene_name, user_id))
 
 def track_effect_usage(effect_type: str, effect_name: str, target_type: str, 
                       target_count: int = 0, effect_id: str = None, user_id: str = 'default'):
-    """Effect-Usage in Datenbank loggen"""
+    """Effect-Usage zum gebündelten Schreiben vormerken"""
     if not db_pool:
         return
     
-    try:
-        conn = db_pool.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO effect_usage (effect_type, effect_id, effect_name, user_id, 
-                                    target_type, target_count)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (effect_type, effect_id, effect_name, user_id, target_type, target_count))
-        
-        conn.commit()
-        conn.close()
-    except Exception:
-        pass  # Silent fail für Tracking
+    _enqueue_usage(effect_usage_queue,
+                   (effect_type, effect_id, effect_name, user_id, target_type, target_count))
 
 def log_system_health():
     """System-Health in Datenbank loggen"""
@@ -4207,16 +4655,8 @@ def log_system_health():
         # Health-Check durchführen
         health = get_system_health()
         
-        conn = db_pool.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO system_health_log 
-            (overall_status, hue_bridge_status, database_status, audio_system_status,
-             active_effects_count, memory_usage_mb, cpu_usage_percent, uptime_seconds,
-             recommendations_json)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
+        # Schreiben übernimmt der Usage-Flusher
+        _enqueue_usage(health_log_queue, (
             health['status'],
             health['checks'].get('hue_bridge', 'unknown'),
             health['checks'].get('database', 'unknown'),
@@ -4225,11 +4665,8 @@ def log_system_health():
             memory_usage,
             cpu_usage,
             uptime,
-            json.dumps(health.get('recommendations', []))
+            json_dumps(health.get('recommendations', []))
         ))
-        
-        conn.commit()
-        conn.close()
     except Exception:
         pass  # Silent fail für Health-Logging
 
@@ -4254,6 +4691,9 @@ if __name__ == '__main__':
         power_logging_thread = threading.Thread(target=power_logging_worker, daemon=True)
         power_logging_thread.start()
         print("⚡ Power logging thread started (5 min interval)")
+        
+        # Usage-Tracking Flusher starten
+        start_usage_flusher()
     else:
         print("🗄️ Database: Disabled - Running without logging")
         # Effect Builder ohne DB initialisieren
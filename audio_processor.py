@@ -4,11 +4,13 @@ Audio-Verarbeitungsmodul für Musik-Synchronisation
 Raspberry Pi Audio-Erfassung und Echtzeit-Analyse
 """
 
+import bisect
 import numpy as np
+import queue
 import threading
 import time
 import logging
-from datetime import datetime
+from collections import deque
 from dataclasses import dataclass
 from typing import List, Dict, Optional, Callable
 
@@ -16,7 +18,7 @@ from typing import List, Dict, Optional, Callable
 try:
     import pyaudio
     import scipy.signal
-    from scipy.fft import fft, fftfreq
+    from scipy.fft import rfft
     AUDIO_AVAILABLE = True
 except ImportError:
     AUDIO_AVAILABLE = False
@@ -28,7 +30,7 @@ class AudioConfig:
     sample_rate: int = 44100
     chunk_size: int = 1024
     channels: int = 1
-    format: int = pyaudio.paInt16 if AUDIO_AVAILABLE else None
+    format: int = pyaudio.paFloat32 if AUDIO_AVAILABLE else None  # paInt16 wird weiterhin unterstützt
     device_index: Optional[int] = None
     
 @dataclass
@@ -43,7 +45,7 @@ class FrequencyBands:
 @dataclass
 class AudioFeatures:
     """Extrahierte Audio-Features"""
-    timestamp: float
+    timestamp: float  # time.monotonic(), nur für Intervalle geeignet
     amplitude: float
     bass_energy: float
     mid_energy: float
@@ -63,25 +65,30 @@ class BeatDetector:
         self.onset_threshold = 0.3
         self.min_beat_interval = 0.2  # Min 300 BPM
         self.last_beat_time = 0
-        self.energy_history = []
         self.max_history_size = 43  # ~1 Sekunde bei hop_length=512
+        self.recent_size = 3  # Letzte Chunks für aktuelle Energie
         
-    def detect_beat(self, audio_chunk: np.ndarray) -> bool:
-        """Erkenne Beat in Audio-Chunk"""
-        current_time = time.time()
+        # Ring-Puffer für Energie-Historie (kein pop(0), keine Listen-Konvertierung)
+        self.energy_history = np.zeros(self.max_history_size, dtype=np.float64)
+        self._write_idx = 0
+        self._filled = 0
         
-        # Energie berechnen
-        energy = np.sum(audio_chunk ** 2)
-        self.energy_history.append(energy)
+    def detect_beat(self, energy: float, current_time: float) -> bool:
+        """Erkenne Beat anhand der Chunk-Energie (Summe der quadrierten Samples)"""
         
-        # History begrenzen
-        if len(self.energy_history) > self.max_history_size:
-            self.energy_history.pop(0)
+        size = self.max_history_size
+        self.energy_history[self._write_idx] = energy
+        self._write_idx = (self._write_idx + 1) % size
+        self._filled = min(self._filled + 1, size)
         
         # Beat-Erkennung: Energie-Anstieg über Durchschnitt
-        if len(self.energy_history) >= 10:
-            avg_energy = np.mean(self.energy_history[:-3])
-            current_energy = np.mean(self.energy_history[-3:])
+        if self._filled >= 10:
+            # Solange nicht voll, liegen alle Werte in [0, _filled)
+            total = self.energy_history[:self._filled].sum()
+            recent = sum(self.energy_history[(self._write_idx - k) % size]
+                         for k in range(1, self.recent_size + 1))
+            avg_energy = (total - recent) / (self._filled - self.recent_size)
+            current_energy = recent / self.recent_size
             
             # Beat erkannt wenn Energie-Anstieg und Mindestabstand
             if (current_energy > avg_energy * (1 + self.onset_threshold) and 
@@ -95,25 +102,39 @@ class TempoEstimator:
     """Tempo-Schätzung (BPM)"""
     
     def __init__(self, window_size: int = 100):
-        self.beat_times = []
-        self.window_size = window_size
+        self.window_size = window_size  # Anzahl Beats im Fenster
+        self._last_beat = None
+        self._intervals = deque()  # Beat-Intervalle in Einfügereihenfolge
+        self._sorted_intervals = []  # Dieselben Intervalle sortiert für den Median
+        self._bpm = 0.0
         
     def add_beat(self, timestamp: float):
         """Füge Beat-Zeitstempel hinzu"""
-        self.beat_times.append(timestamp)
-        if len(self.beat_times) > self.window_size:
-            self.beat_times.pop(0)
+        if self._last_beat is not None:
+            interval = timestamp - self._last_beat
+            self._intervals.append(interval)
+            bisect.insort(self._sorted_intervals, interval)
+            
+            # Ältestes Intervall entfernen, wenn das Fenster voll ist
+            if len(self._intervals) >= self.window_size:
+                oldest = self._intervals.popleft()
+                del self._sorted_intervals[bisect.bisect_left(self._sorted_intervals, oldest)]
+            
+            # BPM ändert sich nur bei neuen Beats -> hier statt pro Chunk berechnen
+            self._bpm = self._compute_bpm()
+        self._last_beat = timestamp
     
-    def estimate_bpm(self) -> float:
-        """Schätze BPM aus Beat-Zeitstempeln"""
-        if len(self.beat_times) < 4:
+    def _compute_bpm(self) -> float:
+        """BPM aus dem Median-Intervall (Median für Stabilität)"""
+        count = len(self._sorted_intervals)
+        if count < 3:
             return 0.0
         
-        # Intervalle zwischen Beats berechnen
-        intervals = np.diff(self.beat_times)
-        
-        # Median-Intervall für Stabilität
-        median_interval = np.median(intervals)
+        mid = count // 2
+        if count % 2:
+            median_interval = self._sorted_intervals[mid]
+        else:
+            median_interval = (self._sorted_intervals[mid - 1] + self._sorted_intervals[mid]) / 2
         
         if median_interval > 0:
             bpm = 60.0 / median_interval
@@ -121,10 +142,16 @@ class TempoEstimator:
             return max(60, min(200, bpm))
         
         return 0.0
+    
+    def estimate_bpm(self) -> float:
+        """Schätze BPM aus Beat-Zeitstempeln"""
+        return self._bpm
 
 class AudioProcessor:
     """Haupt-Audio-Verarbeitungsklasse"""
     
+    RING_SIZE = 8  # Gepufferte Chunks, überbrückt kurze Hänger im Processing-Thread
+    
     def __init__(self, config: AudioConfig = None):
         self.config = config or AudioConfig()
         self.is_running = False
@@ -141,6 +168,34 @@ class AudioProcessor:
         self.frequency_callbacks: List[Callable] = []
         self.amplitude_callbacks: List[Callable] = []
         
+        # Standard: PortAudio liefert float32 bereits normalisiert -> Chunk direkt in den Ring.
+        # Nur bei paInt16 im Callback in vorallokierte float32-Puffer konvertieren;
+        # freie Puffer und Ring (Callback -> Processing-Thread) tauschen nur Referenzen aus.
+        self._int16_input = AUDIO_AVAILABLE and self.config.format == pyaudio.paInt16
+        self._inv_scale = np.float32(1.0 / 32768.0)
+        self._free_buffers = queue.Queue()
+        if self._int16_input:
+            for _ in range(self.RING_SIZE + 2):
+                self._free_buffers.put(np.empty(self.config.chunk_size, dtype=np.float32))
+        self._ring = queue.Queue(maxsize=self.RING_SIZE)
+        
+        # Fehler-Logging im Audio-Thread drosseln (max. 1 Eintrag/Sekunde)
+        self._last_err_log = 0.0
+        self._err_count = 0
+        
+        # Einseitiges Spektrum: Frequenzachse einmal berechnen, Magnitude-Puffer wiederverwenden
+        self._rfft_freqs = np.fft.rfftfreq(self.config.chunk_size, 1 / self.config.sample_rate).astype(np.float32)
+        self._mag = np.empty(self.config.chunk_size // 2 + 1, dtype=np.float32)
+        
+        # Bin-Bereiche der Frequenzbänder ändern sich nicht -> einmal als Slices vorberechnen
+        self._band_slices = {
+            name: slice(np.searchsorted(self._rfft_freqs, low),
+                        np.searchsorted(self._rfft_freqs, high, side='right'))
+            for name, (low, high) in (('bass', self.freq_bands.bass),
+                                      ('mid', self.freq_bands.mid),
+                                      ('treble', self.freq_bands.treble))
+        }
+        
         # Thread für Audio-Verarbeitung
         self.processing_thread = None
         
@@ -201,7 +256,8 @@ class AudioProcessor:
                 rate=self.config.sample_rate,
                 input=True,
                 input_device_index=self.config.device_index,
-                frames_per_buffer=self.config.chunk_size
+                frames_per_buffer=self.config.chunk_size,
+                stream_callback=self._stream_callback
             )
             
             self.is_running = True
@@ -217,7 +273,7 @@ class AudioProcessor:
             return True
             
         except Exception as e:
-            self.logger.error(f"Fehler beim Starten der Audio-Verarbeitung: {e}")
+            self.logger.error("Fehler beim Starten der Audio-Verarbeitung: %s", e)
             return False
     
     def stop_processing(self):
@@ -238,49 +294,100 @@ class AudioProcessor:
         
         self.logger.info("Audio-Verarbeitung gestoppt")
     
+    def _log_throttled_error(self, message: str, error: Exception):
+        """Fehler aus Audio-Threads höchstens einmal pro Sekunde loggen"""
+        self._err_count += 1
+        now = time.monotonic()
+        if now - self._last_err_log > 1.0:
+            self.logger.error("%s (x%d): %s", message, self._err_count, error)
+            self._err_count = 0
+            self._last_err_log = now
+    
+    def _stream_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio-Callback: Chunk normalisieren, auf Mono mischen und an den Processing-Thread übergeben"""
+        channels = self.config.channels
+        
+        if not self._int16_input:
+            try:
+                samples = np.frombuffer(in_data, dtype=np.float32)
+                if channels > 1:
+                    # Interleaved Frames -> Mono (Analyse arbeitet auf chunk_size Samples)
+                    samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+                self._ring.put_nowait(samples)
+            except queue.Full:
+                pass  # Processing hängt hinterher -> Chunk verwerfen
+            except Exception as e:
+                self._log_throttled_error("Fehler im Audio-Callback", e)
+            return (None, pyaudio.paContinue)
+        
+        try:
+            buffer = self._free_buffers.get_nowait()
+        except queue.Empty:
+            # Processing hängt hinterher -> Chunk verwerfen
+            return (None, pyaudio.paContinue)
+        
+        try:
+            samples = np.frombuffer(in_data, dtype=np.int16)
+            if channels > 1:
+                # Downmix direkt in den Pool-Puffer, danach normalisieren
+                np.mean(samples.reshape(-1, channels), axis=1, dtype=np.float32, out=buffer)
+                np.multiply(buffer, self._inv_scale, out=buffer)
+            else:
+                np.multiply(samples, self._inv_scale, out=buffer, casting='unsafe')
+            self._ring.put_nowait(buffer)
+        except queue.Full:
+            self._free_buffers.put_nowait(buffer)
+        except Exception as e:
+            # z.B. Chunk-Größe passt nicht zum Puffer: nicht stillschweigend verwerfen
+            self._free_buffers.put_nowait(buffer)
+            self._log_throttled_error("Fehler im Audio-Callback", e)
+        
+        return (None, pyaudio.paContinue)
+    
     def _process_audio_loop(self):
         """Haupt-Audio-Verarbeitungsschleife"""
         while self.is_running:
             try:
-                # Audio-Daten lesen
-                audio_data = self.audio_stream.read(
-                    self.config.chunk_size, 
-                    exception_on_overflow=False
-                )
-                
-                # Zu NumPy-Array konvertieren
-                audio_array = np.frombuffer(audio_data, dtype=np.int16)
-                audio_array = audio_array.astype(np.float32) / 32768.0  # Normalisieren
+                audio_array = self._ring.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            
+            try:
+                # Ein monotoner Zeitstempel pro Chunk für Beat- und Tempo-Logik
+                now = time.monotonic()
                 
                 # Audio-Features extrahieren
-                features = self._extract_features(audio_array)
+                features = self._extract_features(audio_array, now)
                 
                 # Callbacks ausführen
                 self._trigger_callbacks(features)
                 
             except Exception as e:
-                self.logger.error(f"Fehler in Audio-Verarbeitung: {e}")
+                self._log_throttled_error("Fehler in Audio-Verarbeitung", e)
                 time.sleep(0.1)
+            finally:
+                if self._int16_input:
+                    self._free_buffers.put_nowait(audio_array)
     
-    def _extract_features(self, audio_chunk: np.ndarray) -> AudioFeatures:
-        """Extrahiere Audio-Features aus Chunk"""
-        timestamp = time.time()
+    def _extract_features(self, audio_chunk: np.ndarray, timestamp: float) -> AudioFeatures:
+        """Extrahiere Audio-Features aus Chunk (timestamp: time.monotonic())"""
+        # Energie einmal ohne Temporär-Array berechnen, für RMS und Beat-Erkennung
+        energy = float(np.dot(audio_chunk, audio_chunk))
         
         # Amplitude (RMS)
-        amplitude = np.sqrt(np.mean(audio_chunk ** 2))
+        amplitude = np.sqrt(energy / len(audio_chunk))
         
-        # FFT für Frequenzanalyse
-        fft_data = fft(audio_chunk)
-        fft_freqs = fftfreq(len(audio_chunk), 1/self.config.sample_rate)
-        magnitude = np.abs(fft_data)
+        # rFFT für Frequenzanalyse (reelles Signal -> nur positive Frequenzen nötig)
+        magnitude = np.abs(rfft(audio_chunk), out=self._mag)
+        fft_freqs = self._rfft_freqs
         
         # Frequenzbänder-Energie
-        bass_energy = self._get_band_energy(magnitude, fft_freqs, self.freq_bands.bass)
-        mid_energy = self._get_band_energy(magnitude, fft_freqs, self.freq_bands.mid)
-        treble_energy = self._get_band_energy(magnitude, fft_freqs, self.freq_bands.treble)
+        bass_energy = self._get_band_energy('bass')
+        mid_energy = self._get_band_energy('mid')
+        treble_energy = self._get_band_energy('treble')
         
         # Beat-Erkennung
-        beat_detected = self.beat_detector.detect_beat(audio_chunk)
+        beat_detected = self.beat_detector.detect_beat(energy, timestamp)
         if beat_detected:
             self.tempo_estimator.add_beat(timestamp)
         
@@ -288,15 +395,16 @@ class AudioProcessor:
         tempo_bpm = self.tempo_estimator.estimate_bpm()
         
         # Dominante Frequenz
-        dominant_freq_idx = np.argmax(magnitude[:len(magnitude)//2])
-        dominant_frequency = abs(fft_freqs[dominant_freq_idx])
+        dominant_freq_idx = np.argmax(magnitude)
+        dominant_frequency = fft_freqs[dominant_freq_idx]
         
         # Spektraler Schwerpunkt
-        spectral_centroid = np.sum(fft_freqs[:len(fft_freqs)//2] * magnitude[:len(magnitude)//2]) / np.sum(magnitude[:len(magnitude)//2])
+        magnitude_sum = float(magnitude.sum())
+        spectral_centroid = float(np.dot(fft_freqs, magnitude)) / magnitude_sum if magnitude_sum > 0 else 0.0
         
         # Zero Crossing Rate
-        zero_crossings = np.where(np.diff(np.sign(audio_chunk)))[0]
-        zero_crossing_rate = len(zero_crossings) / len(audio_chunk)
+        signs = np.signbit(audio_chunk)
+        zero_crossing_rate = np.count_nonzero(signs[1:] != signs[:-1]) / len(audio_chunk)
         
         return AudioFeatures(
             timestamp=timestamp,
@@ -311,37 +419,43 @@ class AudioProcessor:
             zero_crossing_rate=zero_crossing_rate
         )
     
-    def _get_band_energy(self, magnitude: np.ndarray, freqs: np.ndarray, band: tuple) -> float:
-        """Berechne Energie in Frequenzband"""
-        band_mask = (freqs >= band[0]) & (freqs <= band[1])
-        return np.sum(magnitude[band_mask])
+    def _get_band_energy(self, band: str) -> float:
+        """Berechne Energie in Frequenzband (zusammenhängender Slice des Magnitude-Puffers)"""
+        return float(self._mag[self._band_slices[band]].sum())
     
     def _trigger_callbacks(self, features: AudioFeatures):
         """Triggere registrierte Callbacks"""
         try:
+            beat_callbacks = self.beat_callbacks
+            frequency_callbacks = self.frequency_callbacks
+            amplitude_callbacks = self.amplitude_callbacks
+            
             # Beat-Callbacks
-            if features.beat_detected:
-                for callback in self.beat_callbacks:
+            if beat_callbacks and features.beat_detected:
+                for callback in beat_callbacks:
                     callback(features.tempo_bpm)
             
-            # Frequenz-Callbacks
-            freq_data = {
-                'bass': features.bass_energy,
-                'mid': features.mid_energy,
-                'treble': features.treble_energy,
-                'dominant': features.dominant_frequency,
-                'centroid': features.spectral_centroid
-            }
-            
-            for callback in self.frequency_callbacks:
-                callback(freq_data)
+            # Frequenz-Callbacks (Dict nur bauen, wenn jemand zuhört)
+            if frequency_callbacks:
+                freq_data = {
+                    'bass': features.bass_energy,
+                    'mid': features.mid_energy,
+                    'treble': features.treble_energy,
+                    'dominant': features.dominant_frequency,
+                    'centroid': features.spectral_centroid
+                }
+                
+                for callback in frequency_callbacks:
+                    callback(freq_data)
             
             # Amplitude-Callbacks
-            for callback in self.amplitude_callbacks:
-                callback(features.amplitude)
+            if amplitude_callbacks:
+                amplitude = features.amplitude
+                for callback in amplitude_callbacks:
+                    callback(amplitude)
                 
         except Exception as e:
-            self.logger.error(f"Fehler in Callbacks: {e}")
+            self.logger.error("Fehler in Callbacks: %s", e)
 
 # Utility-Funktionen für Hue-Integration
 def frequency_to_hue(frequency: float) -> int:
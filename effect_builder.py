@@ -4,14 +4,38 @@ Effekt-Builder System für Hue by mrx3k1
 Drag & Drop Interface für Custom-Effekte
 """
 
+import colorsys
 import json
-import uuid
 import os
+import secrets
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional
+from dataclasses import dataclass, fields
 import mysql.connector
 
+# Optionaler schneller JSON-Codec, Fallback auf stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_dumps(obj, indent: bool = False) -> str:
+    """JSON als str serialisieren (orjson falls installiert), auch von app_lite verwendet"""
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode()
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False)
+
+def json_loads(data):
+    """JSON parsen (orjson falls installiert)"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
 @dataclass
 class EffectStep:
     """Einzelner Schritt in einem Custom-Effekt"""
@@ -22,6 +46,17 @@ class EffectStep:
     target_type: str  # 'light', 'group', 'all'
     target_id: Optional[str] = None
 
+def new_id() -> str:
+    """Zufällige 128-Bit-ID als Hex (ohne UUID-Objekt und Formatierung)"""
+    return secrets.token_hex(16)
+
+# Feldnamen einmal auslesen; asdict() kopiert jeden Schritt rekursiv
+_EFFECT_STEP_FIELDS = tuple(f.name for f in fields(EffectStep))
+
+def step_to_dict(step: EffectStep) -> Dict[str, Any]:
+    """Schritt flach in ein Dict für die JSON-Serialisierung umwandeln"""
+    return {name: getattr(step, name) for name in _EFFECT_STEP_FIELDS}
+
 @dataclass
 class CustomEffect:
     """Definition eines Custom-Effekts"""
@@ -36,122 +71,218 @@ class CustomEffect:
     preview_colors: List[str]  # Hex-Farben für Preview
     is_public: bool = False
 
+_CUSTOM_EFFECT_FIELDS = tuple(f.name for f in fields(CustomEffect))
+
+def effect_to_dict(effect: CustomEffect) -> Dict[str, Any]:
+    """Effekt inkl. Schritten in ein Dict umwandeln (ohne asdict-Deep-Copy)"""
+    data = {name: getattr(effect, name) for name in _CUSTOM_EFFECT_FIELDS}
+    data['steps'] = [step_to_dict(step) for step in effect.steps]
+    return data
+
+# SQL für custom_effects
+EFFECT_UPSERT = """
+    INSERT INTO custom_effects 
+    (id, name, description, category, author, created_at, steps_json, 
+     tags_json, preview_colors_json, is_public)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    name = VALUES(name),
+    description = VALUES(description),
+    category = VALUES(category),
+    author = VALUES(author),
+    created_at = VALUES(created_at),
+    steps_json = VALUES(steps_json),
+    tags_json = VALUES(tags_json),
+    preview_colors_json = VALUES(preview_colors_json),
+    is_public = VALUES(is_public)
+"""
+EFFECT_SELECT = """
+    SELECT id, name, description, category, author, created_at, steps_json,
+           tags_json, preview_colors_json, is_public
+    FROM custom_effects WHERE id = %s
+"""
+EFFECT_LIST_SELECT = "SELECT id, name, description, category, author, created_at, preview_colors_json FROM custom_effects"
+EFFECT_DELETE = "DELETE FROM custom_effects WHERE id = %s"
+
+# Gültige Bereiche der Farb-Parameter: (Key, Min, Max, Bezeichnung, 'random' erlaubt) - nur hue wird beim Ausführen zufällig gewählt
+COLOR_PARAM_BOUNDS = (
+    ('hue', 0, 65535, 'Hue-Wert', True),
+    ('sat', 0, 255, 'Sättigung', False),
+    ('bri', 1, 254, 'Helligkeit', False)
+)
+
+# Fallback-Speicher ohne DB: ein JSON pro Effekt plus Metadaten-Index für Listen
+EFFECTS_DIR = 'custom_effects'
+EFFECTS_INDEX_FILE = os.path.join(EFFECTS_DIR, '_index.json')
+
+# umask einmal beim Import lesen (os.umask lässt sich nur setzen, nicht thread-sicher abfragen)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def write_text_atomic(path: str, text: str):
+    """Datei atomar ersetzen (temp-Datei + fsync + rename), nie halb geschrieben"""
+    # mkstemp legt 0600 an: Rechte der bestehenden Datei übernehmen, sonst Standard laut umask
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())  # os.fdatasync gibt es unter macOS nicht
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def effect_metadata(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Listen-Metadaten eines Effekts (ohne Schritte)"""
+    return {
+        'id': data['id'],
+        'name': data['name'],
+        'description': data['description'],
+        'category': data['category'],
+        'author': data['author'],
+        'created_at': data['created_at'],
+        'preview_colors': data.get('preview_colors', ['#FFFFFF'])
+    }
+
+def _freeze(value):
+    """Dicts/Listen rekursiv schreibgeschützt machen (MappingProxyType/tuple)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+# Vordefinierte Effekt-Templates (einmal pro Prozess, schreibgeschützt geteilt)
+EFFECT_TEMPLATES = _freeze({
+    'color_wave': {
+        'name': 'Farbwelle',
+        'description': 'Farben laufen nacheinander durch alle Lichter',
+        'steps': [
+            {
+                'type': 'color',
+                'duration': 2.0,
+                'parameters': {'hue': 0, 'sat': 255, 'bri': 200},
+                'target_type': 'all'
+            },
+            {
+                'type': 'transition',
+                'duration': 1.0,
+                'parameters': {'hue': 15000, 'sat': 255, 'bri': 200},
+                'target_type': 'all'
+            },
+            {
+                'type': 'transition',
+                'duration': 1.0,
+                'parameters': {'hue': 30000, 'sat': 255, 'bri': 200},
+                'target_type': 'all'
+            }
+        ],
+        'preview_colors': ['#FF0000', '#00FF00', '#0000FF']
+    },
+    'breathing': {
+        'name': 'Atemeffekt',
+        'description': 'Sanftes Ein- und Ausblenden',
+        'steps': [
+            {
+                'type': 'brightness',
+                'duration': 3.0,
+                'parameters': {'bri': 50},
+                'target_type': 'all'
+            },
+            {
+                'type': 'transition',
+                'duration': 3.0,
+                'parameters': {'bri': 254},
+                'target_type': 'all'
+            },
+            {
+                'type': 'loop',
+                'duration': 0,
+                'parameters': {'count': -1},  # Endlos
+                'target_type': 'all'
+            }
+        ],
+        'preview_colors': ['#404040', '#FFFFFF']
+    },
+    'disco': {
+        'name': 'Disco-Effekt',
+        'description': 'Schnelle Farbwechsel mit zufälligen Farben',
+        'steps': [
+            {
+                'type': 'color',
+                'duration': 0.5,
+                'parameters': {'hue': 'random', 'sat': 255, 'bri': 254},
+                'target_type': 'all'
+            },
+            {
+                'type': 'delay',
+                'duration': 0.2,
+                'parameters': {},
+                'target_type': 'all'
+            },
+            {
+                'type': 'loop',
+                'duration': 0,
+                'parameters': {'count': -1},
+                'target_type': 'all'
+            }
+        ],
+        'preview_colors': ['#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF']
+    },
+    'sunrise_custom': {
+        'name': 'Sonnenaufgang',
+        'description': 'Natürlicher Sonnenaufgang-Effekt',
+        'steps': [
+            {
+                'type': 'color',
+                'duration': 0,
+                'parameters': {'hue': 8000, 'sat': 255, 'bri': 1},
+                'target_type': 'all'
+            },
+            {
+                'type': 'transition',
+                'duration': 300,  # 5 Minuten
+                'parameters': {'hue': 8000, 'sat': 200, 'bri': 200},
+                'target_type': 'all'
+            },
+            {
+                'type': 'transition',
+                'duration': 300,
+                'parameters': {'hue': 10000, 'sat': 150, 'bri': 254},
+                'target_type': 'all'
+            }
+        ],
+        'preview_colors': ['#FF4500', '#FFA500', '#FFFF99']
+    }
+})
+
 class EffectBuilder:
     """Builder-Klasse für Custom-Effekte"""
     
     def __init__(self, db_pool=None):
         self.db_pool = db_pool
-        self.predefined_templates = self._load_templates()
+        self.predefined_templates = EFFECT_TEMPLATES
+        self._index_lock = threading.Lock()
     
-    def _load_templates(self) -> Dict[str, Any]:
-        """Vordefinierte Effekt-Templates laden"""
-        return {
-            'color_wave': {
-                'name': 'Farbwelle',
-                'description': 'Farben laufen nacheinander durch alle Lichter',
-                'steps': [
-                    {
-                        'type': 'color',
-                        'duration': 2.0,
-                        'parameters': {'hue': 0, 'sat': 255, 'bri': 200},
-                        'target_type': 'all'
-                    },
-                    {
-                        'type': 'transition',
-                        'duration': 1.0,
-                        'parameters': {'hue': 15000, 'sat': 255, 'bri': 200},
-                        'target_type': 'all'
-                    },
-                    {
-                        'type': 'transition',
-                        'duration': 1.0,
-                        'parameters': {'hue': 30000, 'sat': 255, 'bri': 200},
-                        'target_type': 'all'
-                    }
-                ],
-                'preview_colors': ['#FF0000', '#00FF00', '#0000FF']
-            },
-            'breathing': {
-                'name': 'Atemeffekt',
-                'description': 'Sanftes Ein- und Ausblenden',
-                'steps': [
-                    {
-                        'type': 'brightness',
-                        'duration': 3.0,
-                        'parameters': {'bri': 50},
-                        'target_type': 'all'
-                    },
-                    {
-                        'type': 'transition',
-                        'duration': 3.0,
-                        'parameters': {'bri': 254},
-                        'target_type': 'all'
-                    },
-                    {
-                        'type': 'loop',
-                        'duration': 0,
-                        'parameters': {'count': -1},  # Endlos
-                        'target_type': 'all'
-                    }
-                ],
-                'preview_colors': ['#404040', '#FFFFFF']
-            },
-            'disco': {
-                'name': 'Disco-Effekt',
-                'description': 'Schnelle Farbwechsel mit zufälligen Farben',
-                'steps': [
-                    {
-                        'type': 'color',
-                        'duration': 0.5,
-                        'parameters': {'hue': 'random', 'sat': 255, 'bri': 254},
-                        'target_type': 'all'
-                    },
-                    {
-                        'type': 'delay',
-                        'duration': 0.2,
-                        'parameters': {},
-                        'target_type': 'all'
-                    },
-                    {
-                        'type': 'loop',
-                        'duration': 0,
-                        'parameters': {'count': -1},
-                        'target_type': 'all'
-                    }
-                ],
-                'preview_colors': ['#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF']
-            },
-            'sunrise_custom': {
-                'name': 'Sonnenaufgang',
-                'description': 'Natürlicher Sonnenaufgang-Effekt',
-                'steps': [
-                    {
-                        'type': 'color',
-                        'duration': 0,
-                        'parameters': {'hue': 8000, 'sat': 255, 'bri': 1},
-                        'target_type': 'all'
-                    },
-                    {
-                        'type': 'transition',
-                        'duration': 300,  # 5 Minuten
-                        'parameters': {'hue': 8000, 'sat': 200, 'bri': 200},
-                        'target_type': 'all'
-                    },
-                    {
-                        'type': 'transition',
-                        'duration': 300,
-                        'parameters': {'hue': 10000, 'sat': 150, 'bri': 254},
-                        'target_type': 'all'
-                    }
-                ],
-                'preview_colors': ['#FF4500', '#FFA500', '#FFFF99']
-            }
-        }
+    @contextmanager
+    def _conn(self):
+        """Pool-Verbindung ausleihen und auch bei Fehlern zurückgeben"""
+        conn = self.db_pool.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
     
     def create_effect(self, name: str, description: str, category: str, author: str = 'user') -> CustomEffect:
         """Neuen Custom-Effekt erstellen"""
         effect = CustomEffect(
-            id=str(uuid.uuid4()),
+            id=new_id(),
             name=name,
             description=description,
             category=category,
@@ -167,7 +298,7 @@ class EffectBuilder:
                  parameters: Dict[str, Any], target_type: str, target_id: str = None) -> EffectStep:
         """Schritt zu Effekt hinzufügen"""
         step = EffectStep(
-            id=str(uuid.uuid4()),
+            id=new_id(),
             type=step_type,
             duration=duration,
             parameters=parameters,
@@ -188,13 +319,9 @@ class EffectBuilder:
     def reorder_steps(self, effect: CustomEffect, step_ids: List[str]) -> bool:
         """Schritte neu ordnen"""
         try:
-            # Neue Reihenfolge erstellen
-            new_steps = []
-            for step_id in step_ids:
-                for step in effect.steps:
-                    if step.id == step_id:
-                        new_steps.append(step)
-                        break
+            # Neue Reihenfolge über ID-Index erstellen (statt verschachtelter Suche)
+            steps_by_id = {step.id: step for step in effect.steps}
+            new_steps = [steps_by_id[step_id] for step_id in step_ids if step_id in steps_by_id]
             
             # Überprüfen ob alle Schritte gefunden wurden
             if len(new_steps) == len(effect.steps):
@@ -216,29 +343,33 @@ class EffectBuilder:
         if not effect.steps:
             issues.append("Effekt muss mindestens einen Schritt haben")
         
-        # Schritt-Validierung
+        # Schritt-Validierung (ein Durchlauf inkl. Gesamtdauer)
         has_loop = False
+        total_duration = 0.0
+        last_index = len(effect.steps) - 1
         for i, step in enumerate(effect.steps):
             if step.type == 'loop':
                 has_loop = True
-                if i != len(effect.steps) - 1:
+                if i != last_index:
                     warnings.append("Loop-Schritt sollte am Ende stehen")
+            else:
+                total_duration += step.duration
             
             if step.duration < 0:
                 issues.append(f"Schritt {i+1}: Dauer kann nicht negativ sein")
             
             if step.type == 'color':
                 params = step.parameters
-                if 'hue' in params and params['hue'] != 'random':
-                    if not (0 <= params['hue'] <= 65535):
-                        issues.append(f"Schritt {i+1}: Hue-Wert außerhalb gültigen Bereichs")
-                if 'sat' in params and not (0 <= params['sat'] <= 255):
-                    issues.append(f"Schritt {i+1}: Sättigung außerhalb gültigen Bereichs")
-                if 'bri' in params and not (1 <= params['bri'] <= 254):
-                    issues.append(f"Schritt {i+1}: Helligkeit außerhalb gültigen Bereichs")
+                for key, low, high, label, allow_random in COLOR_PARAM_BOUNDS:
+                    value = params.get(key)
+                    if value is None or (allow_random and value == 'random'):
+                        continue
+                    if not isinstance(value, (int, float)):
+                        issues.append(f"Schritt {i+1}: {label} ist keine Zahl")
+                    elif not (low <= value <= high):
+                        issues.append(f"Schritt {i+1}: {label} außerhalb gültigen Bereichs")
         
         # Performance-Warnungen
-        total_duration = sum(step.duration for step in effect.steps if step.type != 'loop')
         if total_duration > 3600:  # 1 Stunde
             warnings.append("Sehr langer Effekt - könnte Performance beeinträchtigen")
         
@@ -256,6 +387,7 @@ class EffectBuilder:
     def generate_preview_colors(self, effect: CustomEffect) -> List[str]:
         """Preview-Farben für Effekt generieren"""
         colors = []
+        hsv_to_rgb = colorsys.hsv_to_rgb
         
         for step in effect.steps[:5]:  # Nur erste 5 Schritte
             if step.type in ['color', 'transition']:
@@ -266,13 +398,8 @@ class EffectBuilder:
                     sat = params.get('sat', 255)
                     bri = params.get('bri', 254)
                     
-                    # HSV zu RGB Konvertierung (vereinfacht)
-                    h = hue / 65535 * 360
-                    s = sat / 255
-                    v = bri / 254
-                    
-                    import colorsys
-                    r, g, b = colorsys.hsv_to_rgb(h/360, s, v)
+                    # HSV zu RGB Konvertierung (Hue-Bereich 0-65535 direkt auf 0-1)
+                    r, g, b = hsv_to_rgb(hue / 65535, sat / 255, bri / 254)
                     hex_color = f"#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}"
                     colors.append(hex_color)
         
@@ -288,29 +415,18 @@ class EffectBuilder:
             return self._save_to_file(effect)
         
         try:
-            conn = self.db_pool.get_connection()
-            cursor = conn.cursor()
-            
-            # Vorherigen Effekt löschen falls vorhanden
-            cursor.execute("DELETE FROM custom_effects WHERE id = %s", (effect.id,))
-            
-            # Neuen Effekt einfügen
-            cursor.execute("""
-                INSERT INTO custom_effects 
-                (id, name, description, category, author, created_at, steps_json, 
-                 tags_json, preview_colors_json, is_public)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                effect.id, effect.name, effect.description, effect.category,
-                effect.author, effect.created_at,
-                json.dumps([asdict(step) for step in effect.steps]),
-                json.dumps(effect.tags),
-                json.dumps(effect.preview_colors),
-                effect.is_public
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self._conn() as conn, conn.cursor() as cursor:
+                # Upsert: ein Statement statt DELETE + INSERT, Steps bleiben ein JSON-Blob
+                cursor.execute(EFFECT_UPSERT, (
+                    effect.id, effect.name, effect.description, effect.category,
+                    effect.author, effect.created_at,
+                    json_dumps([step_to_dict(step) for step in effect.steps]),
+                    json_dumps(effect.tags),
+                    json_dumps(effect.preview_colors),
+                    effect.is_public
+                ))
+                
+                conn.commit()
             return True
             
         except Exception as e:
@@ -320,12 +436,12 @@ class EffectBuilder:
     def _save_to_file(self, effect: CustomEffect) -> bool:
         """Fallback: Effekt in Datei speichern"""
         try:
-            effects_dir = 'custom_effects'
-            os.makedirs(effects_dir, exist_ok=True)
+            os.makedirs(EFFECTS_DIR, exist_ok=True)
             
-            filename = f"{effects_dir}/{effect.id}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(asdict(effect), f, indent=2, ensure_ascii=False)
+            data = effect_to_dict(effect)
+            write_text_atomic(f"{EFFECTS_DIR}/{effect.id}.json", json_dumps(data, indent=True))
+            
+            self._update_index(effect.id, effect_metadata(data))
             return True
         except Exception:
             return False
@@ -336,14 +452,12 @@ class EffectBuilder:
             return self._load_from_file(effect_id)
         
         try:
-            conn = self.db_pool.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM custom_effects WHERE id = %s", (effect_id,))
-            row = cursor.fetchone()
+            with self._conn() as conn, conn.cursor() as cursor:
+                cursor.execute(EFFECT_SELECT, (effect_id,))
+                row = cursor.fetchone()
             
             if row:
-                steps_data = json.loads(row[6])  # steps_json
+                steps_data = json_loads(row[6])  # steps_json
                 steps = [EffectStep(**step_data) for step_data in steps_data]
                 
                 effect = CustomEffect(
@@ -354,13 +468,12 @@ class EffectBuilder:
                     author=row[4],
                     created_at=row[5],
                     steps=steps,
-                    tags=json.loads(row[7]),  # tags_json
-                    preview_colors=json.loads(row[8]),  # preview_colors_json
+                    tags=json_loads(row[7]),  # tags_json
+                    preview_colors=json_loads(row[8]),  # preview_colors_json
                     is_public=row[9]
                 )
                 return effect
             
-            conn.close()
             return None
             
         except Exception as e:
@@ -370,10 +483,10 @@ class EffectBuilder:
     def _load_from_file(self, effect_id: str) -> Optional[CustomEffect]:
         """Fallback: Effekt aus Datei laden"""
         try:
-            filename = f"custom_effects/{effect_id}.json"
+            filename = f"{EFFECTS_DIR}/{effect_id}.json"
             if os.path.exists(filename):
                 with open(filename, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                    data = json_loads(f.read())
                 
                 steps = [EffectStep(**step_data) for step_data in data['steps']]
                 data['steps'] = steps
@@ -382,20 +495,24 @@ class EffectBuilder:
         except Exception:
             return None
     
-    def list_effects(self, category: str = None, author: str = None) -> List[Dict[str, Any]]:
-        """Alle Effekte auflisten"""
+    def list_effects(self, category: str = None, author: str = None,
+                     limit: int = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """Effekte auflisten (neueste zuerst, optional seitenweise)"""
         effects = []
         
         if not self.db_pool:
-            return self._list_from_files(category, author)
+            effects = self._list_from_files(category, author)
+            return effects[offset:offset + limit] if limit is not None else effects[offset:]
         
         try:
-            conn = self.db_pool.get_connection()
-            cursor = conn.cursor()
-            
-            query = "SELECT id, name, description, category, author, created_at, preview_colors_json FROM custom_effects"
+            query = EFFECT_LIST_SELECT
             params = []
             
+            # Ohne Filter liefert idx_created die Reihenfolge direkt (kein Full Scan + Filesort);
+            # mit Filtern passt jeweils ein Composite-Index (..., created_at)
+            if not category and not author:
+                query += " FORCE INDEX (idx_created)"
+            
             conditions = []
             if category:
                 conditions.append("category = %s")
@@ -409,8 +526,13 @@ class EffectBuilder:
             
             query += " ORDER BY created_at DESC"
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+            if limit is not None:
+                query += " LIMIT %s OFFSET %s"
+                params.extend([limit, offset])
+            
+            with self._conn() as conn, conn.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
             
             for row in rows:
                 effects.append({
@@ -420,10 +542,9 @@ class EffectBuilder:
                     'category': row[3],
                     'author': row[4],
                     'created_at': row[5],
-                    'preview_colors': json.loads(row[6])
+                    'preview_colors': json_loads(row[6])
                 })
             
-            conn.close()
             return effects
             
         except Exception as e:
@@ -431,37 +552,69 @@ class EffectBuilder:
             return []
     
     def _list_from_files(self, category: str = None, author: str = None) -> List[Dict[str, Any]]:
-        """Fallback: Effekte aus Dateien auflisten"""
-        effects = []
-        effects_dir = 'custom_effects'
+        """Fallback: Effekte aus dem Metadaten-Index auflisten"""
+        if not os.path.exists(EFFECTS_DIR):
+            return []
         
-        if not os.path.exists(effects_dir):
-            return effects
+        effects = [
+            meta for meta in self._read_index().values()
+            if (not category or meta.get('category') == category)
+            and (not author or meta.get('author') == author)
+        ]
         
-        for filename in os.listdir(effects_dir):
-            if filename.endswith('.json'):
+        return sorted(effects, key=lambda x: x['created_at'], reverse=True)
+    
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        """Metadaten-Index laden, bei Fehlen/Defekt einmalig neu aufbauen"""
+        try:
+            with open(EFFECTS_INDEX_FILE, 'r', encoding='utf-8') as f:
+                return json_loads(f.read())
+        except (OSError, ValueError):
+            with self._index_lock:
+                return self._rebuild_index()
+    
+    def _rebuild_index(self) -> Dict[str, Dict[str, Any]]:
+        """Index aus allen Effekt-Dateien neu erstellen (einmaliger Scan)"""
+        index = {}
+        index_name = os.path.basename(EFFECTS_INDEX_FILE)
+        with os.scandir(EFFECTS_DIR) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or entry.name == index_name:
+                    continue
                 try:
-                    with open(f"{effects_dir}/{filename}", 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    if category and data.get('category') != category:
-                        continue
-                    if author and data.get('author') != author:
-                        continue
-                    
-                    effects.append({
-                        'id': data['id'],
-                        'name': data['name'],
-                        'description': data['description'],
-                        'category': data['category'],
-                        'author': data['author'],
-                        'created_at': data['created_at'],
-                        'preview_colors': data.get('preview_colors', ['#FFFFFF'])
-                    })
+                    # Binär lesen: orjson parst bytes direkt, ohne UTF-8-Decode in str
+                    with open(entry.path, 'rb') as f:
+                        meta = effect_metadata(json_loads(f.read()))
+                    index[meta['id']] = meta
                 except Exception:
                     continue
         
-        return sorted(effects, key=lambda x: x['created_at'], reverse=True)
+        try:
+            self._write_index(index)
+        except OSError:
+            pass  # Listen funktioniert auch ohne persistierten Index
+        return index
+    
+    def _write_index(self, index: Dict[str, Dict[str, Any]]):
+        """Index atomar schreiben"""
+        write_text_atomic(EFFECTS_INDEX_FILE, json_dumps(index))
+    
+    def _update_index(self, effect_id: str, meta: Optional[Dict[str, Any]]):
+        """Index-Eintrag setzen bzw. bei meta=None entfernen"""
+        with self._index_lock:
+            try:
+                with open(EFFECTS_INDEX_FILE, 'r', encoding='utf-8') as f:
+                    index = json_loads(f.read())
+            except (OSError, ValueError):
+                # Neu aufbauen enthält die bereits geschriebene/gelöschte Datei schon
+                self._rebuild_index()
+                return
+            
+            if meta is None:
+                index.pop(effect_id, None)
+            else:
+                index[effect_id] = meta
+            self._write_index(index)
     
     def delete_effect(self, effect_id: str) -> bool:
         """Effekt löschen"""
@@ -469,14 +622,10 @@ class EffectBuilder:
             return self._delete_file(effect_id)
         
         try:
-            conn = self.db_pool.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM custom_effects WHERE id = %s", (effect_id,))
-            deleted = cursor.rowcount > 0
-            
-            conn.commit()
-            conn.close()
+            with self._conn() as conn, conn.cursor() as cursor:
+                cursor.execute(EFFECT_DELETE, (effect_id,))
+                deleted = cursor.rowcount > 0
+                conn.commit()
             return deleted
             
         except Exception:
@@ -485,16 +634,17 @@ class EffectBuilder:
     def _delete_file(self, effect_id: str) -> bool:
         """Fallback: Effekt-Datei löschen"""
         try:
-            filename = f"custom_effects/{effect_id}.json"
+            filename = f"{EFFECTS_DIR}/{effect_id}.json"
             if os.path.exists(filename):
                 os.remove(filename)
+                self._update_index(effect_id, None)
                 return True
             return False
         except Exception:
             return False
     
-    def get_templates(self) -> Dict[str, Any]:
-        """Verfügbare Templates zurückgeben"""
+    def get_templates(self) -> Mapping[str, Any]:
+        """Verfügbare Templates zurückgeben (schreibgeschützt, ohne Kopie)"""
         return self.predefined_templates
     
     def create_from_template(self, template_key: str, name: str, author: str = 'user') -> Optional[CustomEffect]:
@@ -516,12 +666,12 @@ class EffectBuilder:
                 effect=effect,
                 step_type=step_data['type'],
                 duration=step_data['duration'],
-                parameters=step_data['parameters'],
+                parameters=dict(step_data['parameters']),  # Template nicht mitverändern
                 target_type=step_data['target_type'],
                 target_id=step_data.get('target_id')
             )
         
-        effect.preview_colors = template['preview_colors']
+        effect.preview_colors = list(template['preview_colors'])
         return effect
 
 # Utility-Funktionen für die Integration
@@ -543,12 +693,23 @@ def init_effect_builder_db(db_pool):
                 tags_json TEXT,
                 preview_colors_json TEXT,
                 is_public BOOLEAN DEFAULT FALSE,
-                INDEX idx_category (category),
-                INDEX idx_author (author),
-                INDEX idx_created (created_at)
+                INDEX idx_created (created_at),
+                INDEX idx_category_author_created (category, author, created_at),
+                INDEX idx_category_created (category, created_at),
+                INDEX idx_author_created (author, created_at)
             )
         """)
         
+        # Bestehende Tabellen um die Composite-Indizes für list_effects ergänzen
+        for index_name, columns in (('idx_category_author_created', 'category, author, created_at'),
+                                    ('idx_category_created', 'category, created_at'),
+                                    ('idx_author_created', 'author, created_at')):
+            try:
+                cursor.execute(f"CREATE INDEX {index_name} ON custom_effects ({columns})")
+            except mysql.connector.Error as e:
+                if e.errno != 1061:  # ER_DUP_KEYNAME: Index existiert bereits
+                    raise
+        
         conn.commit()
         conn.close()
         return True
@@ -5,12 +5,125 @@ Zentrale Fehlerbehandlung mit intelligenten Lösungsvorschlägen
 """
 
 import logging
+import os
+import re
+import threading
+import time
 import traceback
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, Callable
 from functools import wraps
+from flask import jsonify
 import requests
+from requests.adapters import HTTPAdapter
 import mysql.connector
+import mysql.connector.pooling
+
+# Fehler-Keywords je Tag; der Lookahead findet auch überlappende Treffer (z.B. "huenv")
+ERROR_KEYWORD_GROUPS = (
+    ('connection', ('connection', 'timeout', 'unreachable')),
+    ('api_key', ('unauthorized', 'api key', 'authentication')),
+    ('mysql', ('mysql',)),
+    ('audio', ('audio',)),
+    ('hue', ('hue',)),
+    ('thread', ('thread',)),
+    ('config', ('config', 'env'))
+)
+ERROR_KEYWORD_RE = re.compile('(?=' + '|'.join(
+    f"(?P<{tag}>{'|'.join(map(re.escape, keywords))})" for tag, keywords in ERROR_KEYWORD_GROUPS
+) + ')')
+DATABASE_ERROR_TYPES = frozenset({'DatabaseError', 'OperationalError'})
+# Alle Fehler des MySQL-Connectors (InterfaceError, ProgrammingError, ...) per isinstance erkennen
+DATABASE_ERROR_CLASSES = (mysql.connector.Error,)
+
+# Gemeinsamer Pool für Health-Probes: Gesamtdauer = langsamste Probe statt Summe
+HEALTH_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='health')
+HEALTH_PROBE_TIMEOUT = 2.0
+
+# Probe-Ergebnisse kurz cachen: Dashboard-Polling und Health-Logging teilen sich einen Check
+HEALTH_PROBE_TTL = 5.0
+_health_probe_cache = {}
+_health_probe_cache_lock = threading.Lock()
+
+def cached_probe(name: str, probe: Callable, ttl: float = HEALTH_PROBE_TTL) -> Callable:
+    """Probe so kapseln, dass ein Ergebnis jünger als ttl wiederverwendet wird"""
+    def run():
+        now = time.monotonic()
+        with _health_probe_cache_lock:
+            entry = _health_probe_cache.get(name)
+        if entry and now - entry[0] < ttl:
+            return entry[1]
+        
+        # Probe ohne Lock ausführen, damit parallele Probes sich nicht blockieren
+        result = probe()
+        with _health_probe_cache_lock:
+            _health_probe_cache[name] = (time.monotonic(), result)
+        return result
+    return run
+
+# Keep-Alive-Session für die Bridge-Probe: wiederholte Health-Checks sparen den TCP-Aufbau
+HEALTH_SESSION = requests.Session()
+HEALTH_SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+# Konfiguration der Health-Probes einmal beim Import lesen; reload_env() liest sie neu
+HEALTH_BRIDGE_IP = None
+HEALTH_USERNAME = None
+HEALTH_DB_CONFIG = {}
+
+# Kleiner eigener Pool für die Datenbank-Probe (lazy, erst beim ersten Health-Check)
+_health_db_pool = None
+_health_db_pool_lock = threading.Lock()
+
+def reload_env():
+    """Bridge- und DB-Konfiguration neu aus der Umgebung lesen (z.B. nach Config-Änderung)"""
+    global HEALTH_BRIDGE_IP, HEALTH_USERNAME, HEALTH_DB_CONFIG, _health_db_pool
+    HEALTH_BRIDGE_IP = os.getenv('HUE_BRIDGE_IP')
+    HEALTH_USERNAME = os.getenv('HUE_USERNAME')
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'database': os.getenv('DB_NAME', 'hue_monitoring')
+    }
+    with _health_db_pool_lock:
+        if db_config != HEALTH_DB_CONFIG:
+            # Pool mit alter Konfiguration verwerfen, beim nächsten Check neu anlegen
+            _health_db_pool = None
+        HEALTH_DB_CONFIG = db_config
+    with _health_probe_cache_lock:
+        _health_probe_cache.clear()
+
+reload_env()
+
+def get_health_db_pool():
+    """Health-Check-Pool anlegen bzw. wiederverwenden; Fehler beim Anlegen werden weitergereicht"""
+    global _health_db_pool
+    with _health_db_pool_lock:
+        if _health_db_pool is None:
+            _health_db_pool = mysql.connector.pooling.MySQLConnectionPool(
+                pool_name='health',
+                pool_size=4,  # reicht für parallele Health-Checks ohne 'pool exhausted'
+                **HEALTH_DB_CONFIG
+            )
+        return _health_db_pool
+
+def run_probes(probes: Dict[str, Callable], timeout: float = HEALTH_PROBE_TIMEOUT) -> Dict[str, Any]:
+    """Probes parallel ausführen; nicht rechtzeitig fertige liefern 'timed_out'"""
+    futures = {name: HEALTH_EXECUTOR.submit(probe) for name, probe in probes.items()}
+    wait(futures.values(), timeout=timeout)
+    
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            results[name] = 'timed_out'
+        elif future.exception():
+            results[name] = f'error: {str(future.exception())}'
+        else:
+            results[name] = future.result()
+    return results
 
 # Error-Kategorien und Lösungsvorschläge
 ERROR_SOLUTIONS = {
@@ -93,47 +206,65 @@ ERROR_SOLUTIONS = {
     }
 }
 
+# Lösungen einmal schreibgeschützt einfrieren; handle_error teilt sie ohne Kopie
+ERROR_SOLUTIONS = {
+    category: MappingProxyType({**solution, 'solutions': tuple(solution['solutions'])})
+    for category, solution in ERROR_SOLUTIONS.items()
+}
+
+# Fallback für Kategorien ohne Eintrag ('technical' wird pro Fehler gesetzt)
+UNKNOWN_ERROR_SOLUTION = MappingProxyType({
+    'title': 'Unbekannter Fehler',
+    'solutions': ('Logs prüfen', 'Server neu starten', 'Support kontaktieren'),
+    'user_action': 'Diagnose durchführen'
+})
+
 class SmartErrorHandler:
     """Intelligenter Error-Handler mit Diagnose und Lösungsvorschlägen"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        self.error_count = {}
-        self.last_errors = []
+        self.error_count = Counter()
         self.max_error_history = 50
+        # (Kategorie, Typ, Meldung) -> Eintrag; Wiederholungen zählen hoch statt Slots zu belegen
+        self.last_errors = OrderedDict()
+        self._lock = threading.Lock()
     
     def categorize_error(self, error: Exception, context: str = None) -> str:
         """Kategorisiere Fehler basierend auf Exception-Typ und Kontext"""
         error_str = str(error).lower()
         error_type = type(error).__name__
+        context = (context or '').lower()
+        
+        # Ein Regex-Durchlauf statt einzelner Substring-Suchen je Keyword
+        hits = {match.lastgroup for match in ERROR_KEYWORD_RE.finditer(error_str)}
         
         # Hue Bridge Verbindungsfehler
-        if any(keyword in error_str for keyword in ['connection', 'timeout', 'unreachable']):
-            if 'bridge' in (context or '').lower():
-                return 'hue_bridge_connection'
+        if 'connection' in hits and 'bridge' in context:
+            return 'hue_bridge_connection'
         
         # API-Key Probleme
-        if any(keyword in error_str for keyword in ['unauthorized', 'api key', 'authentication']):
+        if 'api_key' in hits:
             return 'hue_api_key'
         
         # Datenbank-Fehler
-        if error_type in ['DatabaseError', 'OperationalError'] or 'mysql' in error_str:
+        if isinstance(error, DATABASE_ERROR_CLASSES) or error_type in DATABASE_ERROR_TYPES or 'mysql' in hits:
             return 'database_connection'
         
-        # Audio-Fehler
-        if 'audio' in error_str or error_type == 'ImportError' and 'pyaudio' in error_str:
+        # Audio-Fehler ('audio' deckt auch 'pyaudio' ab)
+        if 'audio' in hits:
             return 'audio_system'
         
         # Lichtsteuerungs-Fehler
-        if 'light' in (context or '').lower() or 'hue' in error_str:
+        if 'light' in context or 'hue' in hits:
             return 'light_control'
         
         # Effekt-Fehler
-        if 'effect' in (context or '').lower() or 'thread' in error_str:
+        if 'effect' in context or 'thread' in hits:
             return 'effect_system'
         
         # Konfigurationsfehler
-        if 'config' in error_str or 'env' in error_str:
+        if 'config' in hits:
             return 'config_error'
         
         return 'general_error'
@@ -141,115 +272,141 @@ class SmartErrorHandler:
     def handle_error(self, error: Exception, context: str = None, user_data: Dict = None) -> Dict[str, Any]:
         """Hauptfunktion für Fehlerbehandlung"""
         error_category = self.categorize_error(error, context)
+        error_type = type(error).__name__
+        message = str(error)
+        timestamp = datetime.now().isoformat()
         
-        # Error-Count für Trend-Analyse
-        self.error_count[error_category] = self.error_count.get(error_category, 0) + 1
-        
-        # Error-Info erstellen
-        error_info = {
-            'timestamp': datetime.now().isoformat(),
-            'category': error_category,
-            'error_type': type(error).__name__,
-            'message': str(error),
-            'context': context,
-            'count': self.error_count[error_category],
-            'solutions': ERROR_SOLUTIONS.get(error_category, {
-                'title': 'Unbekannter Fehler',
-                'solutions': ['Logs prüfen', 'Server neu starten', 'Support kontaktieren'],
-                'technical': str(error),
-                'user_action': 'Diagnose durchführen'
-            })
-        }
-        
-        # Trace für Development
-        if logging.getLogger().isEnabledFor(logging.DEBUG):
-            error_info['traceback'] = traceback.format_exc()
+        # Trace für Development (Level-Check ist im Logger gecacht, format_exc nur bei DEBUG)
+        trace = traceback.format_exc() if self.logger.isEnabledFor(logging.DEBUG) else None
         
-        # Error-History aktualisieren
-        self.last_errors.append(error_info)
-        if len(self.last_errors) > self.max_error_history:
-            self.last_errors.pop(0)
+        key = (error_category, error_type, message)
+        with self._lock:
+            # Error-Count für Trend-Analyse
+            self.error_count[error_category] += 1
+            
+            error_info = self.last_errors.get(key)
+            if error_info is None:
+                solutions = ERROR_SOLUTIONS.get(error_category)
+                if solutions is None:
+                    solutions = {**UNKNOWN_ERROR_SOLUTION, 'technical': message}
+                
+                # Error-Info erstellen
+                error_info = {
+                    'timestamp': timestamp,
+                    'first_timestamp': timestamp,
+                    'category': error_category,
+                    'error_type': error_type,
+                    'message': message,
+                    'context': context,
+                    'count': self.error_count[error_category],
+                    'occurrences': 1,
+                    'solutions': solutions
+                }
+                self.last_errors[key] = error_info
+                if len(self.last_errors) > self.max_error_history:
+                    self.last_errors.popitem(last=False)
+            else:
+                # Wiederholter Fehler: Eintrag aktualisieren und ans Ende der Historie schieben
+                error_info['timestamp'] = timestamp
+                error_info['context'] = context
+                error_info['count'] = self.error_count[error_category]
+                error_info['occurrences'] += 1
+                self.last_errors.move_to_end(key)
+            
+            if trace:
+                error_info['traceback'] = trace
+            error_info = dict(error_info)  # Snapshot für den Aufrufer
         
-        # Logging
-        self.logger.error(f"[{error_category}] {error_info['message']}")
+        # Logging mit %-Platzhaltern: formatiert erst, wenn ein Handler den Eintrag ausgibt
+        self.logger.error("[%s] %s", error_category, message)
         if context:
-            self.logger.error(f"Context: {context}")
+            self.logger.error("Context: %s", context)
         
         return error_info
     
     def get_error_statistics(self) -> Dict[str, Any]:
         """Fehlerstatistiken für Monitoring"""
-        return {
-            'error_counts': self.error_count,
-            'total_errors': sum(self.error_count.values()),
-            'categories': list(self.error_count.keys()),
-            'most_common': max(self.error_count.items(), key=lambda x: x[1]) if self.error_count else None,
-            'recent_errors': self.last_errors[-10:]  # Letzte 10 Fehler
-        }
+        with self._lock:
+            return {
+                'error_counts': dict(self.error_count),
+                'total_errors': sum(self.error_count.values()),
+                'categories': list(self.error_count.keys()),
+                'most_common': max(self.error_count.items(), key=lambda x: x[1]) if self.error_count else None,
+                'recent_errors': [dict(entry) for entry in list(self.last_errors.values())[-10:]]  # Letzte 10 Fehler
+            }
     
-    def diagnose_system_health(self) -> Dict[str, Any]:
-        """System-Gesundheitscheck mit Diagnose"""
-        health_report = {
-            'timestamp': datetime.now().isoformat(),
-            'status': 'healthy',
-            'checks': {},
-            'recommendations': []
-        }
+    def _check_hue_bridge(self) -> tuple:
+        """Hue Bridge Test -> (check, degraded, recommendations)"""
+        bridge_ip = HEALTH_BRIDGE_IP
+        username = HEALTH_USERNAME
+        
+        if not (bridge_ip and username):
+            return 'config_missing', False, ['Hue Bridge Konfiguration vervollständigen']
         
-        # Hue Bridge Test
         try:
-            import os
-            bridge_ip = os.getenv('HUE_BRIDGE_IP')
-            username = os.getenv('HUE_USERNAME')
-            
-            if bridge_ip and username:
-                response = requests.get(f"http://{bridge_ip}/api/{username}/lights", timeout=5)
-                if response.status_code == 200:
-                    health_report['checks']['hue_bridge'] = 'ok'
-                else:
-                    health_report['checks']['hue_bridge'] = 'error'
-                    health_report['status'] = 'degraded'
-                    health_report['recommendations'].append('Hue Bridge API-Zugriff prüfen')
-            else:
-                health_report['checks']['hue_bridge'] = 'config_missing'
-                health_report['recommendations'].append('Hue Bridge Konfiguration vervollständigen')
+            # Timeout an das Probe-Limit angleichen, damit der Worker nicht länger blockiert
+            response = HEALTH_SESSION.get(f"http://{bridge_ip}/api/{username}/lights",
+                                          timeout=HEALTH_PROBE_TIMEOUT)
+            if response.status_code == 200:
+                return 'ok', False, []
+            return 'error', True, ['Hue Bridge API-Zugriff prüfen']
         except Exception as e:
-            health_report['checks']['hue_bridge'] = f'error: {str(e)}'
-            health_report['status'] = 'degraded'
-        
-        # Datenbank Test
+            return f'error: {str(e)}', True, []
+    
+    def _check_database(self) -> tuple:
+        """Datenbank Test -> (check, degraded, recommendations)"""
         try:
-            import os
-            db_config = {
-                'host': os.getenv('DB_HOST', 'localhost'),
-                'user': os.getenv('DB_USER', 'root'),
-                'password': os.getenv('DB_PASSWORD', ''),
-                'database': os.getenv('DB_NAME', 'hue_monitoring'),
-            }
-            
-            conn = mysql.connector.connect(**db_config)
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            health_report['checks']['database'] = 'ok'
-            conn.close()
+            # Pool-Verbindung statt neuem Handshake pro Check; close() gibt sie nur zurück
+            conn = get_health_db_pool().get_connection()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+            finally:
+                conn.close()
+            return 'ok', False, []
         except Exception as e:
-            health_report['checks']['database'] = f'error: {str(e)}'
-            health_report['status'] = 'degraded'
-            health_report['recommendations'].append('Datenbank-Verbindung prüfen')
-        
-        # Audio System Test
+            return f'error: {str(e)}', True, ['Datenbank-Verbindung prüfen']
+    
+    def _check_audio_system(self) -> tuple:
+        """Audio System Test -> (check, degraded, recommendations)"""
         try:
             import pyaudio
             p = pyaudio.PyAudio()
             device_count = p.get_device_count()
             p.terminate()
-            health_report['checks']['audio_system'] = f'ok ({device_count} devices)'
+            return f'ok ({device_count} devices)', False, []
         except ImportError:
-            health_report['checks']['audio_system'] = 'libraries_missing'
-            health_report['recommendations'].append('Audio-Libraries installieren: pip install pyaudio scipy')
+            return 'libraries_missing', False, ['Audio-Libraries installieren: pip install pyaudio scipy']
         except Exception as e:
-            health_report['checks']['audio_system'] = f'error: {str(e)}'
+            return f'error: {str(e)}', False, []
+    
+    def diagnose_system_health(self) -> Dict[str, Any]:
+        """System-Gesundheitscheck mit Diagnose"""
+        health_report = {
+            'timestamp': datetime.now().isoformat(),
+            'status': 'healthy',
+            'checks': {},
+            'recommendations': []
+        }
+        
+        # Bridge, Datenbank und Audio unabhängig voneinander parallel prüfen
+        results = run_probes({
+            'hue_bridge': cached_probe('hue_bridge', self._check_hue_bridge),
+            'database': cached_probe('database', self._check_database),
+            'audio_system': cached_probe('audio_system', self._check_audio_system)
+        })
+        
+        for name, result in results.items():
+            if isinstance(result, tuple):
+                check, degraded, recommendations = result
+            else:
+                # Timeout oder unerwarteter Fehler der Probe
+                check, degraded, recommendations = result, True, []
+            health_report['checks'][name] = check
+            health_report['recommendations'].extend(recommendations)
+            if degraded:
+                health_report['status'] = 'degraded'
         
         # Error-Rate Analysis
         total_errors = sum(self.error_count.values())
@@ -268,20 +425,20 @@ def smart_error_handler(context: str = None):
             try:
                 return func(*args, **kwargs)
             except Exception as e:
-                error_handler = SmartErrorHandler()
-                error_info = error_handler.handle_error(e, context or func.__name__)
+                # Globale Instanz: Zähler und Historie bleiben über Requests erhalten
+                error_info = global_error_handler.handle_error(e, context or func.__name__)
+                solutions = error_info['solutions']
                 
                 # Flask JSON Response
-                from flask import jsonify
                 return jsonify({
                     'success': False,
                     'error': {
                         'category': error_info['category'],
                         'message': error_info['message'],
-                        'title': error_info['solutions']['title'],
-                        'solutions': error_info['solutions']['solutions'],
-                        'user_action': error_info['solutions']['user_action'],
-                        'technical_details': error_info['solutions']['technical'],
+                        'title': solutions['title'],
+                        'solutions': solutions['solutions'],
+                        'user_action': solutions['user_action'],
+                        'technical_details': solutions['technical'],
                         'error_id': f"{error_info['category']}_{error_info['count']}"
                     }
                 }), 500
@@ -1,16 +1,17 @@
 import os
 
 # HTTPS Proxy Support
+HUE_BRIDGE_IP = os.environ.get('HUE_BRIDGE_IP', '192.168.2.35')
 IS_HTTPS = os.environ.get('HTTPS', '').lower() == 'true' or \
            os.environ.get('X-Forwarded-Proto', '') == 'https'
 
+# Einmal beim Import auflösen (direkt oder über Proxy)
+HUE_API_URL = "/api/hue-bridge" if IS_HTTPS else f"http://{HUE_BRIDGE_IP}/api"
+
 def get_hue_api_url():
     """Gibt die richtige Hue API URL zurück (direkt oder über Proxy)"""
-    if IS_HTTPS:
-        return "/api/hue-bridge"
-    else:
-        return f"http://{HUE_BRIDGE_IP}/api"
+    return HUE_API_URL
 
-# Diese Funktion in deinen API-Calls verwenden:
+# Diese Funktion (oder HUE_API_URL direkt) in deinen API-Calls verwenden:
 # base_url = get_hue_api_url()
 # response = requests.get(f"{base_url}/{username}/lights")
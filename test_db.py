@@ -4,18 +4,21 @@ Teste die MySQL Datenbankverbindung
 """
 import mysql.connector
 import os
+from datetime import datetime
 from pathlib import Path
 
 # .env laden
 def load_env():
     env_path = Path(__file__).parent / '.env'
-    if env_path.exists():
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
+    if not env_path.exists():
+        return
+    
+    # Einmal lesen, gültige KEY=VALUE Zeilen sammeln und gesammelt übernehmen
+    lines = (line.strip() for line in env_path.read_text().splitlines())
+    os.environ.update(
+        line.split('=', 1) for line in lines
+        if line and not line.startswith('#') and '=' in line
+    )
 
 load_env()
 
@@ -29,12 +32,13 @@ MYSQL_CONFIG = {
 
 def test_connection():
     """Teste MySQL Verbindung"""
-    print("🔌 Teste MySQL Verbindung...")
-    print(f"Host: {MYSQL_CONFIG['host']}")
-    print(f"User: {MYSQL_CONFIG['user']}")
-    print(f"Database: {MYSQL_CONFIG['database']}")
-    print(f"Password: {'[gesetzt]' if MYSQL_CONFIG['password'] else '[leer]'}")
-    print()
+    # Zusammenhängende Ausgabeblöcke mit einem print statt einem Aufruf pro Zeile
+    print("🔌 Teste MySQL Verbindung...",
+          f"Host: {MYSQL_CONFIG['host']}",
+          f"User: {MYSQL_CONFIG['user']}",
+          f"Database: {MYSQL_CONFIG['database']}",
+          f"Password: {'[gesetzt]' if MYSQL_CONFIG['password'] else '[leer]'}",
+          "", sep="\n")
     
     try:
         # Verbindung testen
@@ -44,8 +48,8 @@ def test_connection():
         # MySQL Version
         cursor.execute("SELECT VERSION()")
         version = cursor.fetchone()[0]
-        print(f"✅ Verbindung erfolgreich!")
-        print(f"   MySQL Version: {version}")
+        print("✅ Verbindung erfolgreich!",
+              f"   MySQL Version: {version}", sep="\n")
         
         # Datenbank prüfen
         cursor.execute("SHOW DATABASES LIKE %s", (MYSQL_CONFIG['database'],))
@@ -60,21 +64,21 @@ def test_connection():
             print(f"   Tabellen: {[t[0] for t in tables] if tables else 'keine'}")
             
         else:
-            print(f"❌ Datenbank '{MYSQL_CONFIG['database']}' existiert nicht")
-            print("   Führe setup.sh aus oder erstelle sie manuell:")
-            print(f"   sudo mysql -u root -e \"CREATE DATABASE {MYSQL_CONFIG['database']};\"")
+            print(f"❌ Datenbank '{MYSQL_CONFIG['database']}' existiert nicht",
+                  "   Führe setup.sh aus oder erstelle sie manuell:",
+                  f"   sudo mysql -u root -e \"CREATE DATABASE {MYSQL_CONFIG['database']};\"", sep="\n")
         
         cursor.close()
         conn.close()
         
     except mysql.connector.Error as e:
-        print(f"❌ Verbindungsfehler: {e}")
-        print()
-        print("🔧 Mögliche Lösungen:")
-        print("1. MySQL installiert? sudo apt install mysql-server")
-        print("2. MySQL läuft? sudo systemctl start mysql")
-        print("3. Root Passwort? sudo mysql_secure_installation")
-        print("4. Umgebungsvariablen korrekt? Check .env")
+        print(f"❌ Verbindungsfehler: {e}",
+              "",
+              "🔧 Mögliche Lösungen:",
+              "1. MySQL installiert? sudo apt install mysql-server",
+              "2. MySQL läuft? sudo systemctl start mysql",
+              "3. Root Passwort? sudo mysql_secure_installation",
+              "4. Umgebungsvariablen korrekt? Check .env", sep="\n")
         
         return False
     
@@ -134,17 +138,24 @@ def insert_test_data():
         
         print("\n🧪 Füge Testdaten ein...")
         
-        # Test power log
-        cursor.execute("""
+        now = datetime.now()
+        
+        # Test power log: mehrere Zeilen per executemany (ein Multi-Row INSERT),
+        # so wie log_power_consumption in app_lite schreibt
+        power_rows = [
+            (now, '1', 'Test Licht', 5.5, 180),
+            (now, '2', 'Test Licht 2', 9.0, 254)
+        ]
+        cursor.executemany("""
             INSERT INTO power_log (timestamp, light_id, light_name, watts, brightness)
-            VALUES (NOW(), '1', 'Test Licht', 5.5, 180)
-        """)
+            VALUES (%s, %s, %s, %s, %s)
+        """, power_rows)
         
-        # Test total consumption
+        # Test total consumption (gleiche Transaktion, ein Commit)
         cursor.execute("""
             INSERT INTO total_consumption (timestamp, total_watts, active_lights)
-            VALUES (NOW(), 15.5, 3)
-        """)
+            VALUES (%s, %s, %s)
+        """, (now, 14.5, len(power_rows)))
         
         conn.commit()
         
@@ -155,9 +166,9 @@ def insert_test_data():
         cursor.execute("SELECT COUNT(*) FROM total_consumption")
         total_count = cursor.fetchone()[0]
         
-        print(f"✅ Testdaten eingefügt:")
-        print(f"   power_log: {power_count} Einträge")
-        print(f"   total_consumption: {total_count} Einträge")
+        print("✅ Testdaten eingefügt:",
+              f"   power_log: {power_count} Einträge",
+              f"   total_consumption: {total_count} Einträge", sep="\n")
         
         cursor.close()
         conn.close()
@@ -169,8 +180,8 @@ def insert_test_data():
         return False
 
 if __name__ == "__main__":
-    print("🗄️ MySQL Datenbanktest für Hue Controller")
-    print("=========================================")
+    print("🗄️ MySQL Datenbanktest für Hue Controller",
+          "=========================================", sep="\n")
     
     if test_connection():
         print("\n" + "="*40)
@@ -182,9 +193,9 @@ if __name__ == "__main__":
                 if test_choice == 'y':
                     insert_test_data()
         
-        print("\n✅ Test abgeschlossen!")
-        print("   Du kannst jetzt den Hue Controller starten:")
-        print("   python3 app.py")
+        print("\n✅ Test abgeschlossen!",
+              "   Du kannst jetzt den Hue Controller starten:",
+              "   python3 app.py", sep="\n")
         
     else:
         print("\n❌ Datenbanktest fehlgeschlagen!")
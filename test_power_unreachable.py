@@ -3,16 +3,22 @@
 Test script to verify power consumption calculation includes unreachable lights
 """
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
 # Configuration
 HUE_BRIDGE_IP = '192.168.2.35'
 HUE_USERNAME = '1trezWogQDPyNuC19bcyOHp8BsNCMZr6wKfXwe6w'
 BASE_URL = f'http://{HUE_BRIDGE_IP}/api/{HUE_USERNAME}'
+WATTS_PER_BRIGHTNESS = 9 / 254  # 9W bei voller Helligkeit (wie in app_lite)
+
+# One keep-alive session for all requests
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=4))
 
 def get_lights():
     """Get all lights from Hue Bridge"""
-    response = requests.get(f'{BASE_URL}/lights')
+    response = SESSION.get(f'{BASE_URL}/lights', timeout=5)
     return response.json()
 
 def test_power_calculation():
@@ -27,7 +33,7 @@ def test_power_calculation():
         brightness = state.get('bri', 254)
         
         if is_on:
-            watts = (brightness / 254) * 9
+            watts = brightness * WATTS_PER_BRIGHTNESS
             print(f"Light {light_id} - {light['name']}:")
             print(f"  On: {is_on}, Reachable: {is_reachable}")
             print(f"  Brightness: {brightness} ({round(brightness/254*100)}%)")
@@ -38,7 +44,7 @@ def test_power_calculation():
 def test_api_endpoint():
     """Test the Flask API endpoint"""
     try:
-        response = requests.get('http://localhost:5000/api/power/current')
+        response = SESSION.get('http://localhost:5000/api/power/current', timeout=5)
         data = response.json()
         
         print("\n=== API Response ===")
@@ -3,7 +3,9 @@
 Test script to verify unreachable lights handling
 """
 import requests
+from requests.adapters import HTTPAdapter
 import json
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import os
 
@@ -15,30 +17,39 @@ HUE_BRIDGE_IP = os.getenv('HUE_BRIDGE_IP')
 HUE_USERNAME = os.getenv('HUE_USERNAME')
 FLASK_BASE_URL = f"http://localhost:{os.getenv('FLASK_PORT', 5000)}"
 
+# One keep-alive session for all requests (Bridge + Flask)
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
 def get_lights_from_bridge():
     """Get lights directly from Hue Bridge"""
     url = f"http://{HUE_BRIDGE_IP}/api/{HUE_USERNAME}/lights"
-    response = requests.get(url, timeout=5)
+    response = SESSION.get(url, timeout=5)
     return response.json()
 
 def get_lights_from_flask():
     """Get lights from Flask API"""
     url = f"{FLASK_BASE_URL}/api/lights"
-    response = requests.get(url, timeout=5)
+    response = SESSION.get(url, timeout=5)
     return response.json()
 
 def get_power_from_flask():
     """Get current power consumption from Flask API"""
     url = f"{FLASK_BASE_URL}/api/power/current"
-    response = requests.get(url, timeout=5)
+    response = SESSION.get(url, timeout=5)
     return response.json()
 
 def main():
     print("🔍 Testing Unreachable Lights Handling\n")
     
-    # Get lights from both sources
-    bridge_lights = get_lights_from_bridge()
-    flask_lights = get_lights_from_flask()
+    # Fetch all three sources in parallel
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        bridge_future = executor.submit(get_lights_from_bridge)
+        flask_future = executor.submit(get_lights_from_flask)
+        power_future = executor.submit(get_power_from_flask)
+        bridge_lights = bridge_future.result()
+        flask_lights = flask_future.result()
+        power_data = power_future.result()
     
     print("📡 Bridge Lights Status:")
     print("-" * 50)
@@ -67,7 +78,6 @@ def main():
     
     print("\n💡 Power Consumption:")
     print("-" * 50)
-    power_data = get_power_from_flask()
     print(f"Total Power: {power_data['total_watts']}W")
     print(f"Active Lights: {power_data['active_lights']}")
     